@@ -1,19 +1,87 @@
 from abc import ABC, abstractmethod
-from datetime import datetime, timedelta
+from collections import UserDict
+from contextlib import contextmanager
+from datetime import datetime, date
+from functools import lru_cache
+import csv
+import json
 import os
 import re
-import dill as pickle
+import sqlite3
+import sys
+import time
 from dateparser import parse as dateparse
 from prompt_toolkit import prompt
 
 
-from .prompt_tool import Completer, RainbowLetter
+from .birthdays import BirthdayCalendar
+from .storage import DillFileStorage, open_storage
+from .prompt_tool import ContactCompleter, RainbowLetter
+from .search_index import SearchIndex
+
+
+PHONE_PATTERN = re.compile(r'[0-9+()]*')
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b')
+ADDRESS_PATTERN = re.compile(r'[A-Za-z0-9,.-]*')
+ISO_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    # ISO dates never need dateparser, which is orders of magnitude slower
+    if ISO_DATE_PATTERN.fullmatch(value):
+        parsed = _parse_iso_date(value)
+        if parsed is not None:
+            return parsed
+    # Not cached: "today" or "tomorrow" mean another date on another day
+    obj_datetime = dateparse(value)
+    return obj_datetime.date() if obj_datetime else None
+
+
+def _restore_field(cls, value):
+    # Values in a snapshot were validated when first entered
+    field = cls.__new__(cls)
+    field._value = value
+    return field
+
+
+def _set_legacy_state(obj, state, defaults):
+    # Snapshots written before __slots__ pickled the instance __dict__, as a plain
+    # dict or, from some picklers, as (dict, slots dict)
+    if isinstance(state, tuple):
+        merged = {}
+        for part in state:
+            merged.update(part or {})
+        state = merged
+    for name, default in defaults.items():
+        setattr(obj, name, state.get(name, default))
 
 
 class Field(ABC):
+    __slots__ = ('_value',)
+
     def __init__(self, some_value):
         self._value = self.validate(some_value)
 
+    def __reduce__(self):
+        return _restore_field, (type(self), self._value)
+
+    def __setstate__(self, state):
+        _set_legacy_state(self, state, {'_value': None})
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._value == other._value
+
+    def __hash__(self):
+        return hash(self._value)
+
     @property
     def value(self):
         return self._value
@@ -27,6 +95,8 @@ class Field(ABC):
 
 
 class NameField(Field):
+    __slots__ = ()
+
     def validate(self, value):
         if not value.isalpha():
             raise ValueError("Name should consist of letters only")
@@ -34,39 +104,56 @@ class NameField(Field):
 
 
 class PhoneField(Field):
+    __slots__ = ()
+
     def validate(self, value):
-        for i in value:
-            if i not in '0123456789+()':
-                raise ValueError("Invalid characters in phone number")
+        if not PHONE_PATTERN.fullmatch(value):
+            raise ValueError("Invalid characters in phone number")
         return value
 
 
 class BirthdayField(Field):
+    __slots__ = ()
+
     def validate(self, value):
-        obj_datetime = dateparse(value)
-        if obj_datetime:
-            return obj_datetime.date()
+        parsed = parse_date(value)
+        if parsed:
+            return parsed
         else:
             raise ValueError('Invalid date format')
 
 
 class EmailField(Field):
+    __slots__ = ()
+
     def validate(self, value):
-        regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b'
-        if not re.fullmatch(regex, value):
+        if not EMAIL_PATTERN.fullmatch(value):
             raise ValueError('Invalid email format')
         return value
 
 
 class AddressField(Field):
+    __slots__ = ()
+
     def validate(self, value):
-        valid_characters = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-,.")
-        if not all(char in valid_characters for char in value):
+        if not ADDRESS_PATTERN.fullmatch(value):
             raise ValueError("Address should consist of letters, digits, hyphen, comma, and period")
         return value
 
 
+def _restore_record(name, phones, birthday, email, address):
+    record = Record.__new__(Record)
+    record.name = _restore_field(NameField, name)
+    record.phones = [_restore_field(PhoneField, phone) for phone in phones]
+    record.birthday = _restore_field(BirthdayField, birthday) if birthday is not None else None
+    record.email = _restore_field(EmailField, email) if email is not None else None
+    record.address = _restore_field(AddressField, address) if address is not None else None
+    return record
+
+
 class Record:
+    __slots__ = ('name', 'phones', 'birthday', 'email', 'address')
+
     def __init__(self, name: NameField, phone: PhoneField, birthday: BirthdayField, email: EmailField, address=None):
         self.name = name
         self.phones = [phone] if phone else []
@@ -74,6 +161,23 @@ class Record:
         self.email = email
         self.address = address
 
+    def astuple(self):
+        return (self.name.value, tuple(phone.value for phone in self.phones),
+                self.birthday.value if self.birthday else None,
+                self.email.value if self.email else None,
+                self.address.value if self.address else None)
+
+    @staticmethod
+    def from_tuple(values):
+        return _restore_record(*values)
+
+    def __reduce__(self):
+        # Pickled as one flat tuple of plain values instead of a graph of Field objects
+        return _restore_record, self.astuple()
+
+    def __setstate__(self, state):
+        _set_legacy_state(self, state, {'name': None, 'phones': [], 'birthday': None, 'email': None, 'address': None})
+
     def add_phone(self, phone):
         phone_number = PhoneField(phone)
         if phone_number not in self.phones:
@@ -88,24 +192,261 @@ class Record:
         pass
 
 
-class AddressBook:
-    def __init__(self):
-        self.data = {}
-
+class AddressBook(UserDict):
+    def __init__(self, storage=None):
+        super().__init__()
+        self.storage = storage or DillFileStorage()
+        # Secondary indexes, kept in sync by add_record/delete_record when the
+        # storage backend does not index records itself
+        self._phones = {}
+        self._emails = {}
+        self.birthdays = BirthdayCalendar()
+        self.search_index = SearchIndex()
+        self._orders = {}
+
+    # Writers take the storage lock and merge what other sessions wrote first,
+    # so nobody overwrites a store state they have not seen
     def add_record(self, record: Record):
-        self.data[record.name.value] = record
+        with self.storage.locked():
+            self.refresh()
+            name = record.name.value
+            old = self._apply('add', name, record)
+            self.storage.put('change' if old is not None else 'add', name, record)
 
     def delete_record(self, name):
-        self.data.pop(name, None)
-
-    def dump(self, filename='AddressBook.bin'):
-        with open(filename, 'wb') as file:
-            pickle.dump(self.data, file)
-
-    def load(self, filename='AddressBook.bin'):
-        if os.path.exists(filename):
-            with open(filename, 'rb') as file:
-                self.data = pickle.load(file)
+        with self.storage.locked():
+            self.refresh()
+            if self._apply('delete', name) is not None:
+                self.storage.delete(name)
+
+    def _apply(self, op, name, record=None):
+        # The in-memory half of a mutation; returns the record it replaced or removed
+        if op == 'delete':
+            old = self.data.pop(name, None)
+        else:
+            old = self.data.get(name)
+            self.data[name] = record
+        if not self.storage.indexed:
+            if old is not None:
+                self._unindex(old)
+            if op != 'delete':
+                self._index(record)
+            self._orders.clear()
+        return old
+
+    def refresh(self):
+        """Merge what other sessions wrote to the storage since this one last loaded or refreshed."""
+        changes = self.storage.changes()
+        if changes is None:
+            self.load()
+            return
+        for op, name, record in changes:
+            self._apply(op, name, record)
+
+    def _index(self, record):
+        name = record.name.value
+        for phone in record.phones:
+            self._phones[phone.value] = name
+        if record.email:
+            self._emails[record.email.value.lower()] = name
+        if record.birthday:
+            self.birthdays.add(name, record.birthday.value)
+        self.search_index.add(name, *self._search_fields(record))
+
+    def _unindex(self, record):
+        name = record.name.value
+        for phone in record.phones:
+            if self._phones.get(phone.value) == name:
+                del self._phones[phone.value]
+        if record.email and self._emails.get(record.email.value.lower()) == name:
+            del self._emails[record.email.value.lower()]
+        self.birthdays.remove(name)
+        self.search_index.remove(name, *self._search_fields(record))
+
+    @staticmethod
+    def _search_fields(record):
+        return (record.email.value if record.email else None,
+                record.address.value if record.address else None)
+
+    def _reindex(self):
+        self._phones, self._emails = {}, {}
+        self.search_index = SearchIndex((record.name.value, *self._search_fields(record))
+                                        for record in self.data.values())
+        for record in self.data.values():
+            for phone in record.phones:
+                self._phones[phone.value] = record.name.value
+            if record.email:
+                self._emails[record.email.value.lower()] = record.name.value
+        self.birthdays.rebuild((name, record.birthday.value) for name, record in self.data.items() if record.birthday)
+        self._orders.clear()
+
+    def _bulk_add(self, rows):
+        with self.storage.locked():
+            self.refresh()
+            return self._bulk_add_locked(rows)
+
+    def _bulk_add_locked(self, rows):
+        # Inserts without journaling or per-record index upkeep, then reindexes
+        # and snapshots once. Returns (imported, [(row_number, error), ...]).
+        records, errors = [], []
+        for number, row in rows:
+            try:
+                phones = [p.strip() for p in (row.get('phone') or '').split(';') if p.strip()]
+                record = Record(NameField(row['name'].strip()),
+                                PhoneField(phones[0]) if phones else None,
+                                BirthdayField(row['birthday'].strip()) if row.get('birthday') else None,
+                                EmailField(row['email'].strip()) if row.get('email') else None,
+                                AddressField(row['address'].strip()) if row.get('address') else None)
+                for phone in phones[1:]:
+                    record.add_phone(phone)
+            except (KeyError, ValueError, AttributeError) as e:
+                errors.append((number, str(e)))
+                continue
+            records.append(record)
+        if self.storage.indexed:
+            self.storage.put_many(records)
+        else:
+            for record in records:
+                self.data[record.name.value] = record
+            self._reindex()
+            self.dump()
+        return len(records), errors
+
+    def import_csv(self, filename):
+        """Columns: name, phone (several separated by ';'), birthday, email, address."""
+        # utf-8-sig: Excel starts the file with a BOM, which would stick to the first column name
+        with open(filename, newline='', encoding='utf-8-sig') as file:
+            return self._bulk_add(enumerate(csv.DictReader(file), start=2))
+
+    def import_vcard(self, filename):
+        with open(filename, encoding='utf-8-sig') as file:
+            return self._bulk_add(read_vcards(file))
+
+    def find_by_phone(self, phone):
+        if self.storage.indexed:
+            return self.storage.find_by_phone(phone)
+        name = self._phones.get(phone)
+        return self.data.get(name) if name else None
+
+    def find_by_email(self, email):
+        if self.storage.indexed:
+            return self.storage.find_by_email(email)
+        name = self._emails.get(email.lower())
+        return self.data.get(name) if name else None
+
+    def find_by_birthday(self, month, day):
+        if self.storage.indexed:
+            return self.storage.find_by_birthday(month, day)
+        return [self.data[name] for name in self.birthdays.on(month, day)]
+
+    def search(self, query):
+        # Name first, then the phone and email indexes
+        if self.storage.indexed:
+            return self.storage.search(query)
+        return self.data.get(query.title()) or self.find_by_phone(query) or self.find_by_email(query)
+
+    def find(self, query, limit=20):
+        """Contacts whose name, email or address starts with query, else those within a typo or two of it."""
+        if self.storage.indexed:
+            return self.storage.prefix_search(query, limit)
+        return [self.data[name] for name in self.search_index.search(query, limit)]
+
+    def complete(self, prefix, limit=20):
+        if self.storage.indexed:
+            return self.storage.complete(prefix, limit)
+        return self.search_index.complete(prefix, limit)
+
+    def upcoming_birthdays(self, days, today=None):
+        # Generator of (date, Record) in date order; O(log N) to find the window start
+        today = today or datetime.now().date()
+        window = self.storage.birthday_window if self.storage.indexed else self.birthdays.window
+        for when, name in window(today, days):
+            yield when, self.data[name]
+
+    def _order(self, sort_key):
+        # Sorted name lists are cached until the next mutation, so paging through
+        # a large book sorts it once
+        order = self._orders.get(sort_key)
+        if order is None:
+            if sort_key == 'birthday':
+                order = self.birthdays.names() + [name for name, record in self.data.items() if not record.birthday]
+            elif sort_key == 'email':
+                order = sorted(self.data, key=lambda name: str(self.data[name].email or '').lower())
+            else:
+                order = sorted(self.data)
+            self._orders[sort_key] = order
+        return order
+
+    def page(self, sort_key='name', page=1, page_size=20):
+        """Return (records on the page, number of pages); pages are numbered from 1."""
+        total = len(self.data)
+        pages = max((total + page_size - 1) // page_size, 1)
+        page = min(max(page, 1), pages)
+        if self.storage.indexed:
+            return self.storage.page(sort_key, (page - 1) * page_size, page_size), pages
+        names = self._order(sort_key)[(page - 1) * page_size:page * page_size]
+        return [self.data[name] for name in names], pages
+
+    def dump(self, filename=None):
+        with self.storage.locked():
+            self.refresh()
+            self.storage.flush(self.data, filename)
+
+    def compact(self, background=True):
+        with self.storage.locked():
+            self.refresh()
+            self.storage.compact(background)
+
+    def load(self, filename=None):
+        if filename is not None:
+            self.storage = open_storage(filename)
+        self.data = self.storage.load(Record.from_tuple)
+        if not self.storage.indexed:
+            self._reindex()
+
+    @contextmanager
+    def transaction(self):
+        # One persist for everything inside the block; on an exception nothing is
+        # written and the in-memory book is reloaded from storage. Other sessions
+        # cannot write until the block ends.
+        with self.storage.locked():
+            self.refresh()
+            self.storage.begin()
+            try:
+                yield self
+            except BaseException:
+                self.storage.rollback()
+                self.close()
+                self.load()
+                raise
+            self.storage.commit()
+
+    def close(self):
+        self.storage.close()
+
+
+VCARD_FIELDS = {'FN': 'name', 'TEL': 'phone', 'BDAY': 'birthday', 'EMAIL': 'email', 'ADR': 'address'}
+
+
+def read_vcards(lines):
+    # Yields (line_number, row) for each BEGIN:VCARD ... END:VCARD block
+    row, start = None, 0
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if line.upper() == 'BEGIN:VCARD':
+            row, start = {}, number
+        elif line.upper() == 'END:VCARD' and row is not None:
+            yield start, row
+            row = None
+        elif row is not None and ':' in line:
+            key, value = line.split(':', 1)
+            field = VCARD_FIELDS.get(key.split(';', 1)[0].upper())
+            if field == 'address':
+                value = ','.join(part.strip() for part in value.split(';') if part.strip())
+            if field == 'phone' and row.get('phone'):
+                row['phone'] += ';' + value
+            elif field and field not in row:
+                row[field] = value
 
 
 contact_list = AddressBook()
@@ -135,7 +476,7 @@ class AddCommand(Command):
 
 class DeleteCommand(Command):
     def execute(self, name):
-        _, name = name.title()
+        name = name.title()
         contact_list.delete_record(name)
         return f'Contact {name} successfully deleted'
 
@@ -153,43 +494,87 @@ class ChangeCommand(Command):
 
 
 class SearchCommand(Command):
-    def execute(self, name):
-        _, name = name.title()
-        result = contact_list.get(name, None)
+    def execute(self, query):
+        result = contact_list.search(query)
         if result:
-            return result.name.value, result.phones[0].value, str(result.birthday.value), result.email.value, result.address.value
+            # Imported contacts may have no phone, birthday, email or address
+            return (result.name.value, result.phones[0].value if result.phones else '', str(result.birthday or ''),
+                    str(result.email or ''), str(result.address or ''))
+        matches = contact_list.find(query)
+        if matches:
+            return 'Did you mean:\n' + '\n'.join(
+                ' | '.join(str(field) for field in (record.name, *record.phones[:1], record.birthday, record.email,
+                                                    record.address) if field) for record in matches)
         return "Contact not found."
 
 
 class ShowAllCommand(Command):
-    def execute(self):
-        command_show_all()
+    def execute(self, *args):
+        # show all [name|birthday|email] [page]; without a page number opens the pager
+        args = [arg for arg in args if arg != 'all']
+        sort_key = args[0] if args and not args[0].isdigit() else 'name'
+        page = next((int(arg) for arg in args if arg.isdigit()), None)
+        if sort_key not in SORT_KEYS:
+            raise CommandError(f"Unknown sort key. Available: {', '.join(SORT_KEYS)}")
+        if page is not None:
+            return command_show_all(sort_key, page)
+        command_pager(sort_key)
+
+
+PAGE_SIZE = 20
+SORT_KEYS = ('name', 'birthday', 'email')
+LINE = '------------------------------------------------------------------------------------------------------------------'
+HEADER = 'Name          |     Number     |     Birthday     |            Email             |             Address           |'
+ROW_LINE = '--------------|----------------|------------------|------------------------------|-------------------------------|'
+
+
+def format_page(records, page, pages):
+    # The whole page is built in memory and written with a single call
+    rows = ['Contacts:', LINE, HEADER]
+    for record in records:
+        rows.append(ROW_LINE)
+        rows.append('{:<14}|{:^16}|{:^18}|{:^30}|{:^30} |'.format(
+            record.name.value, record.phones[0].value if record.phones else '', str(record.birthday or ''),
+            str(record.email or ''), str(record.address or '')))
+    rows.append(LINE)
+    rows.append(f'Page {page} of {pages}')
+    return '\n'.join(rows)
+
+
+def command_show_all(sort_key='name', page=1):
+    if not contact_list:
+        return "The contact list is empty."
+    records, pages = contact_list.page(sort_key, page, PAGE_SIZE)
+    return format_page(records, min(max(page, 1), pages), pages)
 
 
-def command_show_all():
+def command_pager(sort_key='name'):
     if not contact_list:
-        return "The contact list is empty."
-    result = "Contacts:"
-    print(result)
-    print('------------------------------------------------------------------------------------------------------------------')
-    print('Name          |     Number     |     Birthday     |            Email             |             Address           |')
-    for name, value in contact_list.items():
-        print('--------------|----------------|------------------|------------------------------|-------------------------------|')
-        print('{:<14}|{:^16}|{:^18}|{:^30}|{:^30} |'.format(name, value.phones[0].value, str(
-            value.birthday.value), value.email.value, value.address.value))
-    print('------------------------------------------------------------------------------------------------------------------')
+        print("The contact list is empty.")
+        return
+    page = 1
+    while True:
+        records, pages = contact_list.page(sort_key, page, PAGE_SIZE)
+        sys.stdout.write(format_page(records, page, pages) + '\n')
+        sys.stdout.flush()
+        answer = prompt("[n]ext, [p]rev, page number, [q]uit: ").strip().lower()
+        if answer == 'n':
+            page = min(page + 1, pages)
+        elif answer == 'p':
+            page = max(page - 1, 1)
+        elif answer.isdigit():
+            page = min(max(int(answer), 1), pages)
+        elif answer in ('q', ''):
+            break
 
 
 class DaysToBirthdayCommand(Command):
     def execute(self, days):
-        _, days = int(days)
-        result = command_days_to_birthday(days)
-        return result
+        return command_days_to_birthday(days)
 
 
 # @input_error
-def command_days_to_birthday(input_str):
-    _, days = input_str.split()
+def command_days_to_birthday(days):
     try:
         days = int(days)
         if days <= 0:
@@ -197,26 +582,90 @@ def command_days_to_birthday(input_str):
     except ValueError:
         raise ValueError("Invalid number of days")
 
-    result = ''
-    today = datetime.now().date()
-    for key, value in contact_list.items():
-        birthday = value.birthday.value.replace(year=today.year)
-        next_birthday = birthday.replace(year=today.year + 1)
-        if today <= birthday <= (today + timedelta(days=days)) or today <= next_birthday <= (today + timedelta(days=days)):
-            result += f'{key} has a birthday in the next {days} days. ({value.birthday})\n'
-
-    return result.strip() if result else f'No birthdays in the next {days} days'
+    result = '\n'.join(f'{record.name} has a birthday in the next {days} days. ({record.birthday}, on {when})'
+                       for when, record in contact_list.upcoming_birthdays(days))
+    return result if result else f'No birthdays in the next {days} days'
+
+
+COMMANDS = {
+    'add': AddCommand,
+    'change': ChangeCommand,
+    'delete': DeleteCommand,
+    'search': SearchCommand,
+    'birthday': DaysToBirthdayCommand,
+}
+
+
+def parse_batch_line(line):
+    # Either {"command": "add", "args": [...]} or the same text as typed at the prompt
+    if line.startswith('{'):
+        operation = json.loads(line)
+        return operation['command'], [str(arg) for arg in operation.get('args', [])]
+    command, *args = line.split()
+    return command, args
+
+
+def run_batch(lines, verbose=False):
+    """Run commands from an iterable of lines as one transaction.
+
+    Returns (operations, [(line_number, error), ...], seconds).
+    """
+    errors, operations = [], 0
+    start = time.perf_counter()
+    with contact_list.transaction():
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            operations += 1
+            try:
+                name, args = parse_batch_line(line)
+                if name not in COMMANDS:
+                    raise CommandError(f"Unknown command '{name}'")
+                result = COMMANDS[name]().execute(*args)
+                if verbose and result:
+                    print(result)
+            except (CommandError, ValueError, TypeError, KeyError, sqlite3.OperationalError) as e:
+                errors.append((number, str(e)))
+    return operations, errors, time.perf_counter() - start
+
+
+def batch_main(filename):
+    contact_list.load(os.environ.get('ADDRESSBOOK_FILE', 'AddressBook.bin'))
+    try:
+        if filename == '-':
+            operations, errors, seconds = run_batch(sys.stdin)
+        else:
+            with open(filename, encoding='utf-8') as file:
+                operations, errors, seconds = run_batch(file)
+    except sqlite3.OperationalError as e:
+        # The transaction could not start or commit, e.g. another session kept the
+        # database locked; nothing from the batch was written
+        print(f'batch not applied: {e}', file=sys.stderr)
+        return 1
+    finally:
+        contact_list.close()
+    for number, error in errors:
+        print(f'line {number}: {error}', file=sys.stderr)
+    rate = operations / seconds if seconds else 0
+    print(f'{operations} operations, {operations - len(errors)} ok, {len(errors)} failed '
+          f'in {seconds:.2f}s ({rate:.0f} ops/s)')
+    return 1 if errors else 0
 
 
 def main():
-    if os.path.exists('AddressBook.bin'):
-        contact_list.load()
+    contact_list.load(os.environ.get('ADDRESSBOOK_FILE', 'AddressBook.bin'))
     print("Available commands: 'hello', 'add', 'change', \
           'delete', 'search', 'birthday', 'show all', 'good bye', 'close', 'exit'")
 
     while True:
-        input_str = prompt("Enter your command: ", completer=Completer, lexer=RainbowLetter())
+        input_str = prompt("Enter your command: ", completer=ContactCompleter(contact_list), lexer=RainbowLetter())
         command = None
+        # Pick up what other sessions changed while this one waited at the prompt
+        try:
+            contact_list.refresh()
+        except sqlite3.OperationalError as e:
+            print(e)
 
         if input_str == "hello":
             print("How can I help you?")
@@ -230,10 +679,11 @@ def main():
             command = SearchCommand()
         elif input_str.startswith("birthday "):
             command = DaysToBirthdayCommand()
-        elif input_str == "show all":
+        elif input_str.startswith("show all"):
             command = ShowAllCommand()
         elif input_str in ["good bye", "close", "exit"]:
             print("Good bye!")
+            contact_list.close()
             break
         else:
             print("Invalid command. Available commands: 'hello',\
@@ -241,10 +691,10 @@ def main():
 
         if command:
             try:
-                result = command.execute(*input_str.split())
-                print(result)
-                contact_list.dump()
-            except CommandError as e:
+                result = command.execute(*input_str.split()[1:])
+                if result:
+                    print(result)
+            except (CommandError, ValueError, sqlite3.OperationalError) as e:
                 print(e)
 
 
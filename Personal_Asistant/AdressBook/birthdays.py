@@ -0,0 +1,80 @@
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+import calendar
+
+
+# Every birthday is keyed by its day of year in a leap year, so Feb 29 gets its own slot (60)
+MONTH_DAY = {i + 1: (d.month, d.day) for i, d in enumerate(date(2000, 1, 1) + timedelta(days=n) for n in range(366))}
+DAY_KEYS = {month_day: key for key, month_day in MONTH_DAY.items()}
+
+
+def day_key(month, day):
+    return DAY_KEYS[(month, day)]
+
+
+FEB_28 = day_key(2, 28)
+FEB_29 = day_key(2, 29)
+
+
+class BirthdayCalendar:
+    def __init__(self):
+        self._entries = []  # sorted (day_key, name)
+        self._keys = {}     # name -> day_key
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, name, birthday):
+        self.remove(name)
+        key = day_key(birthday.month, birthday.day)
+        insort(self._entries, (key, name))
+        self._keys[name] = key
+
+    def remove(self, name):
+        key = self._keys.pop(name, None)
+        if key is not None:
+            i = bisect_left(self._entries, (key, name))
+            del self._entries[i]
+
+    def names(self):
+        return [name for _, name in self._entries]
+
+    def rebuild(self, birthdays):
+        """Bulk-load from (name, birthday) pairs with a single sort."""
+        self._keys = {name: day_key(b.month, b.day) for name, b in birthdays}
+        self._entries = sorted((key, name) for name, key in self._keys.items())
+
+    def _slice(self, lo_key, hi_key):
+        lo = bisect_left(self._entries, (lo_key,))
+        hi = bisect_left(self._entries, (hi_key + 1,))
+        return self._entries[lo:hi]
+
+    def on(self, month, day):
+        key = day_key(month, day)
+        return [name for _, name in self._slice(key, key)]
+
+    def window(self, start, days):
+        return birthday_window(self._slice, start, days)
+
+
+def birthday_window(slice_entries, start, days):
+    """Yield (date, name) for every birthday in [start, start + days], in date order.
+
+    slice_entries(lo_key, hi_key) returns the sorted (day_key, name) pairs in that
+    range; it is the only access to storage, so the same walk serves in-memory and
+    SQL indexes. Works year by year, so arbitrarily long windows are streamed rather
+    than materialized. In non-leap years Feb 29 birthdays are celebrated on Feb 28.
+    """
+    end = start + timedelta(days=days)
+    for year in range(start.year, end.year + 1):
+        lo = max(start, date(year, 1, 1))
+        hi = min(end, date(year, 12, 31))
+        lo_key, hi_key = day_key(lo.month, lo.day), day_key(hi.month, hi.day)
+        leap = calendar.isleap(year)
+        if not leap and hi_key == FEB_28:
+            hi_key = FEB_29
+        for key, name in slice_entries(lo_key, hi_key):
+            if key == FEB_29 and not leap:
+                yield date(year, 2, 28), name
+            else:
+                yield date(year, *MONTH_DAY[key]), name
@@ -0,0 +1,115 @@
+import os
+import threading
+import dill as pickle
+
+
+class Journal:
+    """Append-only log of AddressBook mutations, one pickled record per operation.
+
+    offset is how far this session has read or written the current log, so the
+    records other sessions appended after it can be read on their own.
+    """
+
+    def __init__(self, filename, compact_every=1000):
+        self.filename = filename
+        self.rotated = filename + '.1'
+        self.compact_every = compact_every
+        self.entries = 0
+        self.offset = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, op, name, record=None):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.filename, 'ab')
+            pickle.dump((op, name, record), self._file)
+            self._file.flush()
+            self.offset = self._file.tell()
+            self.entries += len(record) if op == 'batch' else 1
+
+    def sync(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    @staticmethod
+    def _read(filename, start=0):
+        """(op, name, record) operations stored after byte start, and the offset where the valid ones end."""
+        operations, end = [], start
+        with open(filename, 'rb') as file:
+            file.seek(start)
+            while True:
+                try:
+                    op, name, record = pickle.load(file)
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, TypeError):
+                    # Torn write at the tail after a crash - everything before it is valid
+                    break
+                operations.extend(record if op == 'batch' else [(op, name, record)])
+                end = file.tell()
+        return operations, end
+
+    def _cut_torn_tail(self, end):
+        # Appending after a half-written record would make everything behind it unreadable
+        if os.path.getsize(self.filename) > end:
+            with open(self.filename, 'r+b') as file:
+                file.truncate(end)
+
+    def replay(self, data):
+        # The rotated journal is older than the current one, so it goes first.
+        # Replaying it twice is harmless: every operation is idempotent.
+        self.offset = 0
+        for filename in (self.rotated, self.filename):
+            if not os.path.exists(filename):
+                continue
+            operations, end = self._read(filename)
+            for op, name, record in operations:
+                if op == 'delete':
+                    data.pop(name, None)
+                else:
+                    data[name] = record
+            if filename == self.filename:
+                self.entries += len(operations)
+                self.offset = end
+                self._cut_torn_tail(end)
+        return data
+
+    def read_new(self):
+        """Operations other sessions appended since this one last read or wrote the journal."""
+        if not os.path.exists(self.filename):
+            return []
+        operations, end = self._read(self.filename, self.offset)
+        self._cut_torn_tail(end)
+        self.offset = end
+        self.entries += len(operations)
+        return operations
+
+    def rotate(self):
+        """Move the current log aside so a snapshot can be written while new mutations keep appending."""
+        with self._lock:
+            self.close()
+            if os.path.exists(self.filename):
+                os.replace(self.filename, self.rotated)
+            self.entries = 0
+            self.offset = 0
+
+    def discard_rotated(self):
+        if os.path.exists(self.rotated):
+            os.remove(self.rotated)
+
+    def truncate(self):
+        with self._lock:
+            self.close()
+            for filename in (self.filename, self.rotated):
+                if os.path.exists(filename):
+                    os.remove(filename)
+            self.entries = 0
+            self.offset = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
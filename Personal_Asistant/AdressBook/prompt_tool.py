@@ -3,7 +3,8 @@ from prompt_toolkit.document import Document
 # from prompt_toolkit.formatted_text.base import StyleAndTextTuples
 from prompt_toolkit.lexers import Lexer
 from prompt_toolkit.styles.named_colors import NAMED_COLORS
-from prompt_toolkit.completion import NestedCompleter
+from prompt_toolkit.completion import NestedCompleter, Completion
+from prompt_toolkit.completion import Completer as BaseCompleter
 
 
 class RainbowLetter(Lexer):
@@ -22,4 +23,24 @@ class RainbowLetter(Lexer):
 Completer = NestedCompleter.from_nested_dict({'hello'   : None, 'add'  : None,
                                               'change': None, 'delete': None, 'search': None,
                                               'show all': None, 'good bye'  : None, 'close' : None,
-                                              'exit': None, 'birthday': None})
\ No newline at end of file
+                                              'exit': None, 'birthday': None})
+
+
+class ContactCompleter(BaseCompleter):
+    # Completes contact names after commands that take one, straight from the
+    # address book's prefix index; everything else goes to the command completer.
+    name_commands = ('search ', 'delete ', 'change ')
+
+    def __init__(self, address_book, limit=20):
+        self.address_book = address_book
+        self.limit = limit
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        for command in self.name_commands:
+            if text.startswith(command) and ' ' not in text[len(command):]:
+                prefix = text[len(command):]
+                for name in self.address_book.complete(prefix, self.limit):
+                    yield Completion(name, start_position=-len(prefix))
+                return
+        yield from Completer.get_completions(document, complete_event)
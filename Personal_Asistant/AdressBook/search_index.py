@@ -0,0 +1,195 @@
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+import re
+
+
+TOKEN_SPLIT = re.compile(r'[\s@.,;_+-]+')
+
+
+def tokens(text):
+    return [token for token in TOKEN_SPLIT.split(text.lower()) if token]
+
+
+def trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein distance (adjacent transpositions), or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+class PrefixIndex:
+    """Sorted (key, value) pairs; a prefix query is a bisect to the first key and a walk.
+
+    Serves the role of a trie (O(log N + K) prefix lookups, ordered results) but
+    keeps one tuple per key instead of one dict per character.
+    """
+
+    def __init__(self, pairs=()):
+        self._entries = sorted(set(pairs))
+
+    def insert(self, key, value):
+        i = bisect_left(self._entries, (key, value))
+        if i == len(self._entries) or self._entries[i] != (key, value):
+            self._entries.insert(i, (key, value))
+
+    def remove(self, key, value):
+        i = bisect_left(self._entries, (key, value))
+        if i < len(self._entries) and self._entries[i] == (key, value):
+            del self._entries[i]
+
+    def prefix(self, prefix, limit=None):
+        """Values under prefix, in key order, stopping after limit distinct values."""
+        found, seen = [], set()
+        for key, value in islice(self._entries, bisect_left(self._entries, (prefix,)), None):
+            if not key.startswith(prefix):
+                break
+            if value not in seen:
+                seen.add(value)
+                found.append(value)
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.postings = {}  # trigram -> terms
+        self.terms = {}     # term -> values
+
+    def add(self, term, value):
+        values = self.terms.get(term)
+        if values is None:
+            values = self.terms[term] = set()
+            for gram in trigrams(term):
+                self.postings.setdefault(gram, set()).add(term)
+        values.add(value)
+
+    def remove(self, term, value):
+        values = self.terms.get(term)
+        if values is None:
+            return
+        values.discard(value)
+        if not values:
+            del self.terms[term]
+            for gram in trigrams(term):
+                terms = self.postings.get(gram)
+                if terms is not None:
+                    terms.discard(term)
+                    if not terms:
+                        del self.postings[gram]
+
+    def search(self, query, max_edits=None):
+        """Values whose terms are within max_edits typos of query, best matches first."""
+        if max_edits is None:
+            max_edits = 1 if len(query) <= 4 else 2
+        grams = trigrams(query)
+        # One typo changes at most four trigrams (a transposition), so a match shares
+        # at least `needed` of them, and must therefore appear in the postings of at
+        # least one of the len(grams) - needed + 1 rarest ones.
+        needed = max(len(grams) - 4 * max_edits, 1)
+        rarest = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))[:len(grams) - needed + 1]
+        candidates = set().union(*(self.postings.get(gram, ()) for gram in rarest))
+        scored = Counter()
+        for term in candidates:
+            if abs(len(term) - len(query)) > max_edits:
+                continue
+            shared = len(grams & trigrams(term))
+            if shared < needed:
+                continue
+            distance = edit_distance(query, term, max_edits)
+            if distance <= max_edits:
+                for value in self.terms[term]:
+                    scored[value] = max(scored[value], (max_edits - distance + 1) * len(grams) + shared)
+        return [value for value, _ in scored.most_common()]
+
+
+def prefix_terms(name, email, address):
+    terms = {name.lower()}
+    if email:
+        terms.add(email.lower())
+    if address:
+        terms.update(tokens(address))
+    return terms
+
+
+def fuzzy_terms(name, email, address):
+    # Email domains are shared by most contacts and only add noise to typo matching
+    terms = {name.lower()}
+    if email:
+        terms.add(email.split('@', 1)[0].lower())
+    if address:
+        terms.update(tokens(address))
+    return terms
+
+
+class SearchIndex:
+    """Prefix and trigram indexes over contact names, emails and address words.
+
+    entries is (name, email, address) triples. The trigram index is only built on
+    the first typo-tolerant query and maintained incrementally after that, so
+    loading a book stays a pair of sorts.
+    """
+
+    def __init__(self, entries=()):
+        self._pending = {name: (email, address) for name, email, address in entries}
+        self.names = PrefixIndex((name.lower(), name) for name in self._pending)
+        self.terms = PrefixIndex((term, name) for name, fields in self._pending.items()
+                                 for term in prefix_terms(name, *fields))
+        self._fuzzy = None
+
+    @property
+    def fuzzy(self):
+        if self._fuzzy is None:
+            self._fuzzy = TrigramIndex()
+            for name, fields in self._pending.items():
+                for term in fuzzy_terms(name, *fields):
+                    self._fuzzy.add(term, name)
+            self._pending = None
+        return self._fuzzy
+
+    def add(self, name, email=None, address=None):
+        self.names.insert(name.lower(), name)
+        for term in prefix_terms(name, email, address):
+            self.terms.insert(term, name)
+        if self._fuzzy is None:
+            self._pending[name] = (email, address)
+        else:
+            for term in fuzzy_terms(name, email, address):
+                self._fuzzy.add(term, name)
+
+    def remove(self, name, email=None, address=None):
+        self.names.remove(name.lower(), name)
+        for term in prefix_terms(name, email, address):
+            self.terms.remove(term, name)
+        if self._fuzzy is None:
+            self._pending.pop(name, None)
+        else:
+            for term in fuzzy_terms(name, email, address):
+                self._fuzzy.remove(term, name)
+
+    def complete(self, prefix, limit=20):
+        return self.names.prefix(prefix.lower(), limit)
+
+    def search(self, query, limit=20):
+        # Prefix matches first; typo-tolerant matches only when nothing starts with the query
+        query = query.lower()
+        found = self.terms.prefix(query, limit)
+        if not found:
+            found = self.fuzzy.search(query)[:limit]
+        return found
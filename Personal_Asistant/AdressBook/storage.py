@@ -0,0 +1,436 @@
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from contextlib import nullcontext
+from datetime import date
+import os
+import sqlite3
+import threading
+import dill as pickle
+
+from persistence import DebouncedWriter, StoreLock, atomic_write
+
+from .birthdays import birthday_window, day_key
+from .journal import Journal
+
+
+class Storage(ABC):
+    # An indexed backend answers lookups itself; otherwise AddressBook keeps
+    # its own in-memory indexes over the mapping returned by load().
+    indexed = False
+
+    @abstractmethod
+    def load(self, factory):
+        pass
+
+    @abstractmethod
+    def put(self, op, name, record):
+        pass
+
+    @abstractmethod
+    def delete(self, name):
+        pass
+
+    def put_many(self, records):
+        for record in records:
+            self.put('add', record.name.value, record)
+
+    @abstractmethod
+    def flush(self, data, filename=None):
+        pass
+
+    # Sessions sharing a store: writes happen under locked(), after merging the
+    # changes() other sessions made
+    def locked(self):
+        return nullcontext()
+
+    def changes(self):
+        """Mutations other sessions wrote since the last load or call, as (op, name, record);
+        None when the store was rewritten and has to be loaded again."""
+        return []
+
+    # Transactions: mutations between begin() and commit() are persisted together
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def compact(self, background=True):
+        pass
+
+    def close(self):
+        pass
+
+
+class DillFileStorage(Storage):
+    """The whole book pickled into one snapshot file, plus a journal of later mutations.
+
+    The generation kept in the lock file goes up whenever the snapshot is
+    rewritten or the journal rotated; together with the journal offset it is
+    the version of the store a session has seen. While it is unchanged, other
+    sessions' changes are just the journal records past that offset.
+    """
+
+    def __init__(self, filename='AddressBook.bin', compact_every=1000, sync_interval=1.0):
+        self.filename = filename
+        self.compact_every = compact_every
+        self.sync_interval = sync_interval
+        self.journal = None
+        self.data = {}
+        self._compaction = None
+        self._syncer = None
+        self._batch = None
+        self._lock = StoreLock(filename)
+        self._generation = None
+
+    def locked(self):
+        return self._lock
+
+    def load(self, factory=None):
+        with self._lock:
+            if self.journal is not None:
+                self.close()
+            self.data = {}
+            if os.path.exists(self.filename):
+                with open(self.filename, 'rb') as file:
+                    self.data = pickle.load(file)
+            self.journal = Journal(self.filename + '.journal', self.compact_every)
+            self.journal.replay(self.data)
+            self._generation = self._lock.generation()
+        # Appends reach the OS immediately; fsyncs of a burst of them are coalesced
+        self._syncer = DebouncedWriter(self.journal.sync, self.sync_interval)
+        return self.data
+
+    def changes(self):
+        if self.journal is None:
+            return []
+        with self._lock:
+            if self._lock.generation() != self._generation:
+                return None
+            return self.journal.read_new()
+
+    def put(self, op, name, record):
+        self._log(op, name, record)
+
+    def delete(self, name):
+        self._log('delete', name)
+
+    def _log(self, op, name, record=None):
+        if self.journal is None:
+            return
+        if self._batch is not None:
+            self._batch.append((op, name, record))
+            return
+        self.journal.append(op, name, record)
+        self._syncer.mark_dirty()
+        if self.journal.entries >= self.journal.compact_every:
+            self.compact()
+
+    def begin(self):
+        self._batch = []
+
+    def commit(self):
+        # The whole transaction is one journal record, so a torn write drops all of it
+        batch, self._batch = self._batch, None
+        if batch:
+            self.journal.append('batch', None, batch)
+            self.journal.sync()
+            if self.journal.entries >= self.journal.compact_every:
+                self.compact()
+
+    def rollback(self):
+        self._batch = None
+
+    def _write_snapshot(self, data, filename):
+        atomic_write(filename, lambda file: pickle.dump(data, file))
+
+    def flush(self, data, filename=None):
+        filename = filename or self.filename
+        with self._lock:
+            self.wait_compaction()
+            self._write_snapshot(data, filename)
+            if self.journal is not None and filename == self.filename:
+                self.journal.truncate()
+                self._generation = self._lock.bump()
+
+    def compact(self, background=True):
+        # Folds the journal into a fresh snapshot. The journal is rotated first, so
+        # writes keep going to a new log while the snapshot is being pickled.
+        if self.journal is None:
+            return self.flush(self.data)
+        with self._lock:
+            self.wait_compaction()
+            if os.path.exists(self.journal.rotated):
+                # Left behind by a compaction that crashed; the loaded data already includes it
+                return self.flush(self.data)
+            self.journal.rotate()
+            self._generation = self._lock.bump()
+            data = dict(self.data)
+            # Other sessions wait until the snapshot is in place and the rotated
+            # journal gone; this process keeps writing to the new journal meanwhile
+            self._lock.acquire()
+
+        def run():
+            try:
+                self._write_snapshot(data, self.filename)
+                self.journal.discard_rotated()
+            finally:
+                self._lock.release()
+
+        if background:
+            self._compaction = threading.Thread(target=run, daemon=True)
+            self._compaction.start()
+        else:
+            run()
+
+    def wait_compaction(self):
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+    def close(self):
+        self.wait_compaction()
+        if self._syncer is not None:
+            self._syncer.close()
+        if self.journal is not None:
+            self.journal.close()
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS contacts (
+    name TEXT PRIMARY KEY,
+    phones TEXT,
+    birthday TEXT,
+    birthday_key INTEGER,
+    email TEXT,
+    email_lower TEXT,
+    address TEXT
+);
+CREATE TABLE IF NOT EXISTS phones (
+    phone TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (phone, name)
+);
+CREATE INDEX IF NOT EXISTS contacts_name_nocase ON contacts (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS contacts_email ON contacts (email_lower);
+CREATE INDEX IF NOT EXISTS contacts_birthday ON contacts (birthday_key, name);
+CREATE INDEX IF NOT EXISTS phones_name ON phones (name);
+'''
+
+COLUMNS = 'name, phones, birthday, email, address'
+
+
+class SQLiteRecords(MutableMapping):
+    """Name -> Record view over the contacts table; records are read on first access."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._cache = {}
+
+    def __getitem__(self, name):
+        record = self._cache.get(name)
+        if record is None:
+            record = self.storage.get(name)
+            if record is None:
+                raise KeyError(name)
+            self._cache[name] = record
+        return record
+
+    # Writes reach the database through Storage.put/delete; the mapping only
+    # keeps its cache coherent.
+    def __setitem__(self, name, record):
+        self._cache[name] = record
+
+    def __delitem__(self, name):
+        self._cache.pop(name, None)
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def __contains__(self, name):
+        return name in self._cache or self.storage.get(name) is not None
+
+    def __iter__(self):
+        return self.storage.names()
+
+    def __len__(self):
+        return self.storage.count()
+
+    def items(self):
+        for record in self.storage.records():
+            yield record.name.value, record
+
+    def values(self):
+        return self.storage.records()
+
+
+class SQLiteStorage(Storage):
+    indexed = True
+
+    def __init__(self, filename='AddressBook.db'):
+        self.filename = filename
+        self.connection = None
+        self.factory = None
+        self._records = None
+        self._data_version = None
+        self._in_transaction = False
+
+    def _write(self):
+        # Commits each statement unless an explicit transaction is open
+        return nullcontext() if self._in_transaction else self.connection
+
+    def load(self, factory):
+        self.factory = factory
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self._records = SQLiteRecords(self)
+        self._data_version = self._version()
+        return self._records
+
+    def _version(self):
+        return self.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def changes(self):
+        # SQLite does the locking itself, and lookups already go to the database;
+        # when another connection committed, only the cached records are stale
+        version = self._version()
+        if version != self._data_version:
+            self._data_version = version
+            self._records.invalidate()
+        return []
+
+    def _row_to_record(self, row):
+        name, phones, birthday, email, address = row
+        return self.factory((name, tuple(phones.split(';')) if phones else (),
+                             date.fromisoformat(birthday) if birthday else None, email, address))
+
+    def _insert(self, record):
+        name, phones, birthday, email, address = record.astuple()
+        self.connection.execute('DELETE FROM phones WHERE name = ?', (name,))
+        self.connection.execute(
+            'INSERT OR REPLACE INTO contacts VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (name, ';'.join(phones), birthday.isoformat() if birthday else None,
+             day_key(birthday.month, birthday.day) if birthday else None,
+             email, email.lower() if email else None, address))
+        self.connection.executemany('INSERT OR IGNORE INTO phones VALUES (?, ?)',
+                                    ((phone, name) for phone in phones))
+
+    def put(self, op, name, record):
+        with self._write():
+            self._insert(record)
+
+    def put_many(self, records):
+        with self._write():
+            for record in records:
+                self._insert(record)
+
+    def delete(self, name):
+        with self._write():
+            self.connection.execute('DELETE FROM phones WHERE name = ?', (name,))
+            self.connection.execute('DELETE FROM contacts WHERE name = ?', (name,))
+
+    def _one(self, query, params):
+        row = self.connection.execute(query, params).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def get(self, name):
+        return self._one(f'SELECT {COLUMNS} FROM contacts WHERE name = ?', (name,))
+
+    def find_by_phone(self, phone):
+        return self._one(f'SELECT {COLUMNS} FROM contacts WHERE name = '
+                         '(SELECT name FROM phones WHERE phone = ? LIMIT 1)', (phone,))
+
+    def find_by_email(self, email):
+        return self._one(f'SELECT {COLUMNS} FROM contacts WHERE email_lower = ? LIMIT 1', (email.lower(),))
+
+    def find_by_birthday(self, month, day):
+        cursor = self.connection.execute(f'SELECT {COLUMNS} FROM contacts WHERE birthday_key = ? ORDER BY name',
+                                         (day_key(month, day),))
+        return [self._row_to_record(row) for row in cursor]
+
+    def search(self, query):
+        # Name, phone and email in one statement; each branch is an index seek
+        return self._one(f'''
+            SELECT {COLUMNS} FROM contacts WHERE name = :name
+            UNION ALL
+            SELECT {COLUMNS} FROM contacts WHERE name = (SELECT name FROM phones WHERE phone = :query LIMIT 1)
+            UNION ALL
+            SELECT {COLUMNS} FROM contacts WHERE email_lower = :email
+            LIMIT 1''', {'name': query.title(), 'query': query, 'email': query.lower()})
+
+    def complete(self, prefix, limit=20):
+        cursor = self.connection.execute('SELECT name FROM contacts WHERE name >= ? COLLATE NOCASE '
+                                         'AND name < ? COLLATE NOCASE ORDER BY name COLLATE NOCASE LIMIT ?',
+                                         (prefix, prefix + '\uffff', limit))
+        return [name for (name,) in cursor]
+
+    def prefix_search(self, query, limit=20):
+        # Range scans over the name and email indexes; typo-tolerant matching
+        # needs the in-memory trigram index, which this backend does not build
+        query = query.lower()
+        cursor = self.connection.execute(f'''
+            SELECT * FROM (SELECT {COLUMNS} FROM contacts WHERE name >= :lo COLLATE NOCASE
+                           AND name < :hi COLLATE NOCASE LIMIT :limit)
+            UNION
+            SELECT * FROM (SELECT {COLUMNS} FROM contacts WHERE email_lower >= :lo AND email_lower < :hi LIMIT :limit)
+            LIMIT :limit''', {'lo': query, 'hi': query + '\uffff', 'limit': limit})
+        return [self._row_to_record(row) for row in cursor]
+
+    def _birthday_slice(self, lo_key, hi_key):
+        return self.connection.execute('SELECT birthday_key, name FROM contacts WHERE birthday_key BETWEEN ? AND ? '
+                                       'ORDER BY birthday_key, name', (lo_key, hi_key))
+
+    def birthday_window(self, start, days):
+        return birthday_window(self._birthday_slice, start, days)
+
+    def names(self):
+        return (name for (name,) in self.connection.execute('SELECT name FROM contacts ORDER BY name'))
+
+    def records(self):
+        return (self._row_to_record(row) for row in
+                self.connection.execute(f'SELECT {COLUMNS} FROM contacts ORDER BY name'))
+
+    def page(self, sort_key, offset, limit):
+        order = {'birthday': 'birthday_key IS NULL, birthday_key, name', 'email': 'email_lower, name'}.get(sort_key, 'name')
+        cursor = self.connection.execute(f'SELECT {COLUMNS} FROM contacts ORDER BY {order} LIMIT ? OFFSET ?',
+                                         (limit, offset))
+        return [self._row_to_record(row) for row in cursor]
+
+    def count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+    def flush(self, data, filename=None):
+        self.connection.commit()
+
+    def begin(self):
+        # Takes the write lock up front, so a concurrent writer cannot make this
+        # transaction fail halfway through
+        self.connection.execute('BEGIN IMMEDIATE')
+        self._in_transaction = True
+
+    def commit(self):
+        self._in_transaction = False
+        self.connection.commit()
+
+    def rollback(self):
+        self._in_transaction = False
+        self.connection.rollback()
+
+    def compact(self, background=True):
+        self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def open_storage(filename):
+    if os.path.splitext(filename)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SQLiteStorage(filename)
+    return DillFileStorage(filename)
@@ -1,19 +1,63 @@
-import json
+import gc
 import os
+import sys
 from datetime import datetime
+from itertools import islice
 from .promp_ut import Completer, RainbowLexer, Sort_Completer
+from .note_io import read_notes, write_notes
+from .note_log import NoteLog
+from .sorted_view import SORT_KEYS, SortedView
+from .query_cache import QueryCache
+from .similarity import MinHashIndex
+from .text_index import InvertedIndex, parse_query
 from prompt_toolkit import prompt
 from colorama import Fore
 
+PAGE_SIZE = 10
+TITLE_WIDTH = 20
+CONTENT_WIDTH = 50
+# Notes imported per log write; only their metadata stays in memory afterwards
+IMPORT_BATCH = 10000
+
+
 class InputError(Exception):
     pass
 
+class ConflictError(InputError):
+    pass
+
 class Note:
-    def __init__(self, title, content, tags=None, created_at=None):
+    # Once a note is in the log only its metadata stays in memory; content is
+    # read back from the log file when something asks for it
+    __slots__ = ('id', 'title', 'tags', 'created_at', 'version', '_content', '_log', '_offset')
+
+    def __init__(self, title, content, tags=None, created_at=None, id=None, version=0):
+        self.id = id
         self.title = title
-        self.content = content
         self.tags = tags or []
         self.created_at = created_at
+        # Bumped on every edit, so an edit based on an older copy can be refused
+        self.version = version
+        self.content = content
+
+    @property
+    def content(self):
+        if self._content is None and self._log is not None:
+            return self._log.read_content(self._offset)
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+        self._log = self._offset = None
+
+    def stored_at(self, log, offset):
+        self._content = None
+        self._log, self._offset = log, offset
+
+    def to_dict(self):
+        return {'id': self.id, 'title': self.title, 'content': self.content, 'tags': self.tags,
+                'created_at': self.created_at, 'version': self.version}
 
 class NoteManagerBuilder:
     def __init__(self, storage_path):
@@ -28,123 +72,475 @@ class NoteManagerBuilder:
         self.note_manager.save_notes()
         print(Fore.GREEN + "Note added!")
 
-    def edit_note_command(self, index, title, content, tags=None):
-        self.note_manager.edit_note(index, title, content, tags)
+    def edit_note_command(self, note_id, title, content, tags=None, version=None):
+        self.note_manager.edit_note(note_id, title, content, tags, version)
         self.note_manager.save_notes()
         print(Fore.GREEN + "Note edited!")
 
-    def delete_note_command(self, index):
-        note = self.note_manager.notes[index]
-        self.note_manager.display_note(index, note)
+    def delete_note_command(self, note_id):
+        note = self.note_manager.get_note(note_id)
+        self.note_manager.display_note(note)
         to_delete = input("Delete? Press 'Y'+'Enter' -> Yes; Press 'Enter' -> No >>")
         if to_delete.lower() == 'y':
-            self.note_manager.delete_note(index)
+            self.note_manager.delete_note(note_id, note.version)
             self.note_manager.save_notes()
             print(Fore.GREEN + "Note deleted!")
 
-    def search_tag_command(self, tag):
-        matching_notes = self.note_manager.search_notes_by_tag(tag)
+    def import_command(self, path):
+        if not os.path.exists(path):
+            print(f"{path} not found")
+            return
+        errors = []
+
+        def notes():
+            for where, note, error in read_notes(path):
+                if error is None:
+                    yield note
+                else:
+                    errors.append((where, error))
+
+        count = len(self.note_manager.import_notes(notes()))
+        self.note_manager.save_notes()
+        for where, error in errors:
+            print(f"{where}: {error}")
+        print(Fore.GREEN + f"Imported {count} notes, {len(errors)} skipped.")
+
+    def export_command(self, path):
+        count = self.note_manager.export_notes(path)
+        print(Fore.GREEN + f"Exported {count} notes to {path}.")
+
+    def search_tag_command(self, query):
+        # "a, b" -> notes with both tags; "a | b" -> notes with either
+        match_all = '|' not in query
+        tags = [tag.strip() for tag in query.replace('|', ',').split(',') if tag.strip()]
+        matching_notes = self.note_manager.search_notes_by_tags(tags, match_all)
         if matching_notes:
-            for i, note in enumerate(matching_notes):
-                self.note_manager.display_note(i, note)
+            self.pager_command(matching_notes)
         else:
             print(Fore.GREEN + "No notes found with this tag.")
 
+    def similar_command(self, note_id):
+        similar = self.note_manager.similar_notes(note_id)
+        if not similar:
+            print(Fore.GREEN + "No similar notes found.")
+            return
+        sys.stdout.write('\n'.join(f"{score:4.0%} {format_note_line(note)}" for note, score in similar) + '\n')
+
+    def dedupe_command(self, threshold=0.7):
+        clusters = self.note_manager.duplicate_clusters(threshold)
+        if not clusters:
+            print(Fore.GREEN + "No near-duplicate notes found.")
+            return
+        rows = []
+        for number, cluster in enumerate(clusters, start=1):
+            rows.append(f"Group {number} ({len(cluster)} notes):")
+            rows.extend(format_note_line(note) for note in cluster)
+        sys.stdout.write('\n'.join(rows) + '\n')
+
+    def stats_command(self):
+        stats = self.note_manager.cache_stats()
+        lookups = stats['hits'] + stats['misses']
+        rate = stats['hits'] / lookups * 100 if lookups else 0
+        print(f"Notes: {len(self.note_manager.notes)}")
+        print(f"Search cache: {stats['hits']} hits, {stats['misses']} misses ({rate:.0f}% hit rate), "
+              f"{stats['size']}/{stats['maxsize']} queries cached, generation {stats['generation']}")
+
+    def tag_counts_command(self):
+        for tag, count in self.note_manager.tag_counts():
+            print(f"{tag}: {count}")
+
     def search_content_command(self, keyword):
         matching_notes = self.note_manager.search_notes_by_content(keyword)
         if matching_notes:
-            for i, note in enumerate(matching_notes):
-                self.note_manager.display_note(i, note)
+            self.pager_command(matching_notes)
         else:
             print(Fore.GREEN + "No notes found with this keyword.")
 
+    def display_notes_command(self, options=''):
+        # "[compact] [N]" - one line per note and/or N notes per page
+        words = options.lower().split()
+        size = next((int(word) for word in words if word.isdigit()), PAGE_SIZE)
+        notes = list(self.note_manager.notes.values())
+        if not notes:
+            print(Fore.GREEN + "No notes yet.")
+            return
+        self.pager_command(notes, max(size, 1), 'compact' in words)
+
+    def pager_command(self, notes, size=PAGE_SIZE, compact=False):
+        page = 1
+        pages = max((len(notes) + size - 1) // size, 1)
+        while True:
+            sys.stdout.write(format_page(notes[(page - 1) * size:page * size], page, pages, compact) + '\n')
+            sys.stdout.flush()
+            if pages == 1:
+                break
+            answer = input("[n]ext, [p]rev, page number, [c]ompact/full, [q]uit: ").strip().lower()
+            if answer == 'n':
+                page = min(page + 1, pages)
+            elif answer == 'p':
+                page = max(page - 1, 1)
+            elif answer.isdigit():
+                page = min(max(int(answer), 1), pages)
+            elif answer == 'c':
+                compact = not compact
+            elif answer in ('q', ''):
+                break
+
     def sort_notes_command(self, sort_choice):
-        if sort_choice == "Sort by name":
-            sorted_notes = self.note_manager.sort_notes(by_name=True)
-        elif sort_choice == "Sort by tags":
-            sorted_notes = self.note_manager.sort_notes(by_tags=True)
-        elif sort_choice == "Sort by date":
-            sorted_notes = self.note_manager.sort_notes(by_created_date=True)
-        else:
+        # "<name|tags|tag_count|date> [desc] [N]" - N limits the output to the top N notes
+        words = sort_choice.lower().replace('sort by ', '').replace('sort_', '').split()
+        if not words or words[0] not in SORT_KEYS:
             print("Невірний вибір сортування")
             return
+        reverse = 'desc' in words[1:]
+        limit = next((int(word) for word in words[1:] if word.isdigit()), None)
+        sorted_notes = self.note_manager.sort_notes(words[0], reverse, limit)
 
         if sorted_notes:
-            for i, note in enumerate(sorted_notes):
-                self.note_manager.display_note(i, note)
+            self.pager_command(sorted_notes)
 
 class NoteManager:
-    def __init__(self, storage_path):
+    def __init__(self, storage_path, save_interval=1.0):
         self.storage_path = storage_path
-        self.notes = []
+        self.index_path = os.path.splitext(storage_path)[0] + '.index.json'
+        self.notes = {}  # id -> Note, in insertion order
+        self.tag_index = {}  # lowercase tag -> ids
+        self.sorted_views = {name: SortedView(key) for name, key in SORT_KEYS.items()}
+        self.content_index = InvertedIndex()
+        # Search results as note ids; any add/edit/delete invalidates them
+        self.query_cache = QueryCache()
+        # Built on the first similar/dedupe query, then kept up to date
+        self._similarity = None
+        self._next_id = 1
+        # Every change is appended to the log right away; fsyncs are coalesced
+        self.log = NoteLog(storage_path, sync_interval=save_interval)
 
     def upload_notes(self):
-        if os.path.exists(self.storage_path):
-            with open(self.storage_path, 'r') as file:
-                data = json.load(file)
-                self.notes = [Note(**note_data) for note_data in data]
+        with self.log.lock:
+            self._load()
+
+    def _load(self):
+        # An old notes.json next to a missing log is converted once
+        self.log.migrate(os.path.splitext(self.storage_path)[0] + '.json')
+        # A stale or missing content index is rebuilt while the bodies stream past,
+        # so they are never read twice
+        index = InvertedIndex.load(self.index_path, self._source())
+        rebuild = index is None
+        if rebuild:
+            index = InvertedIndex()
+        notes = {}
+        for offset, record in self.log.records():
+            if record['op'] == 'put':
+                note = Note(**record['note'])
+                if rebuild:
+                    index.add(note.id, note.content)
+                note.stored_at(self.log, offset)
+                notes[note.id] = note
+                self._next_id = max(self._next_id, note.id + 1)
+            elif record['op'] == 'delete':
+                notes.pop(record['id'], None)
+                if rebuild:
+                    index.remove(record['id'])
+                self._next_id = max(self._next_id, record['id'] + 1)
+            elif record['op'] == 'meta':
+                self._next_id = max(self._next_id, record['next_id'])
+        self.notes = notes
+        self.query_cache.invalidate()
+        self._similarity = None
+        self.tag_index = {}
+        for note in notes.values():
+            self._index_tags(note)
+        for view in self.sorted_views.values():
+            view.rebuild(notes.values())
+        self.content_index = index
+
+    def refresh(self):
+        """Merge what other sessions appended to the log since this one last read or wrote it.
+
+        Only the new lines are read, unless another session compacted the log
+        in the meantime; then it is loaded again.
+        """
+        with self.log.lock:
+            if self.log.replaced():
+                self._load()
+                return
+            for offset, record in self.log.records(self.log.end):
+                if record['op'] == 'put':
+                    note = Note(**record['note'])
+                    self._store(note)
+                    note.stored_at(self.log, offset)
+                elif record['op'] == 'delete':
+                    self._drop(record['id'])
+                    self._next_id = max(self._next_id, record['id'] + 1)
+                elif record['op'] == 'meta':
+                    self._next_id = max(self._next_id, record['next_id'])
+
+    def _new_id(self):
+        note_id = self._next_id
+        self._next_id += 1
+        return note_id
+
+    def _source(self):
+        # Size and mtime of the notes file the content index was built from
+        if not os.path.exists(self.storage_path):
+            return None
+        stat = os.stat(self.storage_path)
+        return [stat.st_size, stat.st_mtime_ns]
 
     def save_notes(self):
-        with open(self.storage_path, 'w') as file:
-            data = [note.__dict__ for note in self.notes]
-            json.dump(data, file, indent=4)
+        # add/edit/delete already appended their changes; drop superseded
+        # lines once they outnumber the live notes
+        with self.log.lock:
+            self.refresh()
+            if not self.log.needs_compaction(len(self.notes)):
+                return
+            notes = list(self.notes.values())
+            try:
+                offsets = self.log.compact((note.to_dict() for note in notes), self._next_id)
+            except PermissionError:
+                # Windows: another session still has the log open; a later save retries
+                return
+            for note, offset in zip(notes, offsets):
+                note.stored_at(self.log, offset)
+
+    def _put(self, note):
+        note.stored_at(self.log, self.log.append({'op': 'put', 'note': note.to_dict()}))
+
+    def close(self):
+        # The index is saved against the log as written right now, with
+        # everything other sessions added to it merged in
+        with self.log.lock:
+            self.refresh()
+            self.log.close()
+            self.content_index.save(self.index_path, self._source())
+
+    def get_note(self, note_id):
+        note = self.notes.get(note_id)
+        if note is None:
+            raise InputError(f"Note {note_id} not found")
+        return note
+
+    def _index_tags(self, note):
+        for tag in note.tags:
+            self.tag_index.setdefault(tag.lower(), set()).add(note.id)
+
+    def _unindex_tags(self, note):
+        for tag in note.tags:
+            ids = self.tag_index.get(tag.lower())
+            if ids is not None:
+                ids.discard(note.id)
+                if not ids:
+                    del self.tag_index[tag.lower()]
+
+    def _store(self, note):
+        # Puts note in memory and in every index, replacing the older version of it
+        old = self.notes.get(note.id)
+        if old is not None:
+            self._unindex_tags(old)
+        self.notes[note.id] = note
+        self._index_tags(note)
+        self.content_index.add(note.id, note.content)
+        for view in self.sorted_views.values():
+            view.add(note)
+        if self._similarity is not None:
+            self._similarity.add(note.id, note.content)
+        self.query_cache.invalidate()
+        self._next_id = max(self._next_id, note.id + 1)
+
+    def _drop(self, note_id):
+        note = self.notes.pop(note_id, None)
+        if note is None:
+            return
+        self._unindex_tags(note)
+        self.content_index.remove(note_id)
+        for view in self.sorted_views.values():
+            view.remove(note_id)
+        if self._similarity is not None:
+            self._similarity.remove(note_id)
+        self.query_cache.invalidate()
+
+    def _check_version(self, note, version):
+        if version is not None and note.version != version:
+            raise ConflictError(f"Note {note.id} was changed in another session meanwhile; open it again")
 
+    # Writers take the log lock and merge other sessions' changes first, so ids
+    # stay unique and the version check sees the latest copy of the note
     def add_note(self, title, content, tags=None):
-        note = Note(title, content, tags, created_at=datetime.now().strftime('%Y-%m-%d %H:%M'))
-        self.notes.append(note)
+        with self.log.lock:
+            self.refresh()
+            note = Note(title, content, tags, created_at=datetime.now().strftime('%Y-%m-%d %H:%M'), id=self._new_id())
+            self._store(note)
+            self._put(note)
+        return note
+
+    def edit_note(self, note_id, title, content, tags=None, version=None):
+        """Replace a note; with version given, refuse if the note changed since that version was read."""
+        with self.log.lock:
+            self.refresh()
+            old = self.get_note(note_id)
+            self._check_version(old, version)
+            note = Note(title, content, tags, created_at=datetime.now().strftime('%Y-%m-%d %H:%M'),
+                        id=note_id, version=old.version + 1)
+            self._store(note)
+            self._put(note)
+        return note
+
+    def delete_note(self, note_id, version=None):
+        with self.log.lock:
+            self.refresh()
+            self._check_version(self.get_note(note_id), version)
+            self._drop(note_id)
+            self.log.append({'op': 'delete', 'id': note_id})
 
-    def edit_note(self, note_index, title, content, tags=None):
-        note = self.notes[note_index]
-        note.title = title
-        note.content = content
-        note.tags = tags or []
-        note.created_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    def import_notes(self, records):
+        """Add notes from dicts with title/content/tags/created_at, written to the log IMPORT_BATCH at a time."""
+        with self.log.lock:
+            self.refresh()
+            return self._import(records)
 
-    def delete_note(self, note_index):
-        del self.notes[note_index]
+    def _import(self, records):
+        now = datetime.now().strftime('%Y-%m-%d %H:%M')
+        notes = []
+        # Indexing allocates millions of lists and dicts, none of them cyclic;
+        # the cycle collector would rescan all of them over and over
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        records = iter(records)
+        try:
+            while True:
+                batch = [Note(record.get('title', ''), record.get('content', ''), record.get('tags'),
+                              created_at=record.get('created_at') or now, id=self._new_id())
+                         for record in islice(records, IMPORT_BATCH)]
+                if not batch:
+                    break
+                for note in batch:
+                    self.notes[note.id] = note
+                    self._index_tags(note)
+                    self.content_index.add(note.id, note.content)
+                    if self._similarity is not None:
+                        self._similarity.add(note.id, note.content)
+                # Once in the log, the batch's contents are dropped from memory
+                offsets = self.log.append_many({'op': 'put', 'note': note.to_dict()} for note in batch)
+                for note, offset in zip(batch, offsets):
+                    note.stored_at(self.log, offset)
+                notes.extend(batch)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        # One sort beats thousands of insertions into the middle of each view
+        for view in self.sorted_views.values():
+            view.rebuild(self.notes.values())
+        self.query_cache.invalidate()
+        return notes
+
+    def export_notes(self, path):
+        return write_notes(self.notes.values(), path)
 
     def search_notes_by_tag(self, tag):
-        return [note for note in self.notes if tag.lower() in [t.lower() for t in note.tags]]
+        return self.search_notes_by_tags([tag])
+
+    def search_notes_by_tags(self, tags, match_all=True):
+        tags = frozenset(tag.lower() for tag in tags)
+        ids = self.query_cache.get(('tags', tags, match_all or len(tags) == 1),
+                                   lambda: self._tag_ids(tags, match_all))
+        return [self.notes[note_id] for note_id in ids]
+
+    def _tag_ids(self, tags, match_all):
+        # Intersects (or unites) the id sets, starting from the smallest
+        id_sets = sorted((self.tag_index.get(tag, set()) for tag in tags), key=len)
+        if not id_sets:
+            return ()
+        if match_all:
+            ids = set(id_sets[0]).intersection(*id_sets[1:])
+        else:
+            ids = set().union(*id_sets)
+        return tuple(sorted(ids))
 
-    def search_notes_by_content(self, keyword):
-        return [note for note in self.notes if keyword.lower() in note.content.lower()]
+    def tag_counts(self):
+        return sorted(((tag, len(ids)) for tag, ids in self.tag_index.items()), key=lambda item: (-item[1], item[0]))
 
-    def display_note(self, index, note):
-        print(f"Note {index + 1}:")
-        print(f"Title: {note.title.upper()}")
-        print(f"Content: {note.content}")
-        print(f"Tags: {', '.join(note.tags)}")
-        print(f"Created At: {note.created_at}")
+    def search_notes_by_content(self, query):
+        # Words are AND-ed, OR separates alternatives, "quoted words" must be adjacent;
+        # results come best match first
+        key = ('content', tuple(tuple(group) for group in parse_query(query)))
+        ids = self.query_cache.get(key, lambda: tuple(self.content_index.search(query)))
+        return [self.notes[note_id] for note_id in ids]
+
+    @property
+    def similarity(self):
+        if self._similarity is None:
+            self._similarity = MinHashIndex()
+            for note in self.notes.values():
+                self._similarity.add(note.id, note.content)
+        return self._similarity
+
+    def similar_notes(self, note_id, threshold=0.5, limit=10):
+        """(note, estimated similarity) pairs for notes sharing at least threshold of their phrases."""
+        self.get_note(note_id)
+        return [(self.notes[other], score) for other, score in self.similarity.similar(note_id, threshold, limit)]
+
+    def duplicate_clusters(self, threshold=0.7):
+        """Groups of near-duplicate notes, largest first."""
+        return [[self.notes[note_id] for note_id in group] for group in self.similarity.clusters(threshold)]
+
+    def cache_stats(self):
+        return self.query_cache.stats()
+
+    def display_note(self, note):
+        sys.stdout.write(format_note(note) + '\n')
 
     def display_notes(self):
-        for i, note in enumerate(self.notes):
-            print(f"Note {i + 1}:")
-            print(f"Title: {note.title.upper()}")
-            print(f"Content: {note.content}")
-            print(f"Tags: {', '.join(note.tags)}")
-            print(f"Created At: {note.created_at}")
-            print("-" * 30)
-
-    def sort_notes(self, by_name=False, by_tags=False, by_created_date=False):
-        if by_name:
-            sorted_notes = sorted(self.notes, key=lambda x: x.title)
-        elif by_tags:
-            sorted_notes = sorted(self.notes, key=lambda x: x.tags)
-        elif by_created_date:
-            sorted_notes = sorted(self.notes, key=lambda x: x.created_at)
-        else:
+        sys.stdout.write(format_page(list(self.notes.values()), 1, 1) + '\n')
+
+    def sort_notes(self, by='name', reverse=False, limit=None):
+        """Notes in the order of one of the SORT_KEYS views; limit gives the top K."""
+        view = self.sorted_views.get(by)
+        if view is None:
             return None
-        return sorted_notes
+        return [self.notes[note_id] for note_id in view.ids(reverse, limit)]
+
+def format_note(note):
+    return (f"Note {note.id}:\n"
+            f"Title: {note.title.upper()}\n"
+            f"Content: {note.content}\n"
+            f"Tags: {', '.join(note.tags)}\n"
+            f"Created At: {note.created_at}")
+
+
+def shorten(text, width):
+    text = ' '.join(text.split())
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+def format_note_line(note):
+    return '{:>5} | {:<{tw}} | {:<16} | {:<{cw}} | {}'.format(
+        note.id, shorten(note.title, TITLE_WIDTH), note.created_at or '',
+        shorten(note.content, CONTENT_WIDTH), ', '.join(note.tags), tw=TITLE_WIDTH, cw=CONTENT_WIDTH)
+
+
+def format_page(notes, page, pages, compact=False):
+    # Only the notes on this page are formatted (and their contents read), then
+    # the page goes out in a single write
+    if compact:
+        rows = [format_note_line(note) for note in notes]
+    else:
+        rows = [format_note(note) + '\n' + '-' * 30 for note in notes]
+    if pages > 1:
+        rows.append(f"Page {page} of {pages}")
+    return '\n'.join(rows)
+
 
 def main():
-    storage_path = 'notes.json'
+    storage_path = 'notes.jsonl'
     builder = NoteManagerBuilder(storage_path)
     note_manager = builder.build()
     
-    print("Доступні команди:'add_note','edit_note','delete_note', 'search_tag', 'search_content', 'display_notes','sort','exit'")
+    print("Доступні команди:'add_note','edit_note','delete_note', 'search_tag', 'tags', 'search_content', 'display_notes [compact] [N]','sort','similar <id>','dedupe','stats','import','export','exit'")
     
     while True:
         choice = prompt('Enter your command: ', completer=Completer, lexer=RainbowLexer())
+        # Pick up what other sessions changed while this one waited at the prompt
+        note_manager.refresh()
        
         if choice == 'add_note':
             title = prompt("Enter title: ", lexer=RainbowLexer())
@@ -153,21 +549,54 @@ def main():
             tags = [tag.strip() for tag in input_tags.split(',') if tag.strip()]
             builder.add_note_command(title, content, tags)
         elif choice == 'edit_note':
-            builder.edit_note_command()
+            try:
+                note = note_manager.get_note(int(prompt("Enter note id: ", lexer=RainbowLexer())))
+            except (ValueError, InputError) as e:
+                print(e)
+                continue
+            title = prompt("Enter title: ", default=note.title, lexer=RainbowLexer())
+            content = prompt("Enter note: ", default=note.content, lexer=RainbowLexer())
+            input_tags = prompt("Enter tags (comma-separated): ", default=', '.join(note.tags), lexer=RainbowLexer())
+            tags = [tag.strip() for tag in input_tags.split(',') if tag.strip()]
+            try:
+                builder.edit_note_command(note.id, title, content, tags, note.version)
+            except InputError as e:
+                print(e)
         elif choice == 'delete_note':
-            builder.delete_note_command()
+            try:
+                builder.delete_note_command(int(prompt("Enter note id: ", lexer=RainbowLexer())))
+            except (ValueError, InputError) as e:
+                print(e)
         elif choice == 'search_tag':
-            tag = prompt("Enter tag to search for: ", lexer=RainbowLexer())
+            tag = prompt("Enter tags to search for ('a, b' - all of them, 'a | b' - any): ", lexer=RainbowLexer())
             builder.search_tag_command(tag)
+        elif choice == 'tags':
+            builder.tag_counts_command()
+        elif choice == 'stats':
+            builder.stats_command()
+        elif choice.split()[:1] == ['similar']:
+            try:
+                note_id = choice.split()[1] if len(choice.split()) > 1 else prompt("Enter note id: ", lexer=RainbowLexer())
+                builder.similar_command(int(note_id))
+            except (ValueError, InputError) as e:
+                print(e)
+        elif choice == 'dedupe':
+            builder.dedupe_command()
+        elif choice == 'import':
+            builder.import_command(prompt("Enter a .jsonl file or a folder of .md files: ", lexer=RainbowLexer()).strip())
+        elif choice == 'export':
+            builder.export_command(prompt("Enter a .jsonl file or a folder for .md files: ", lexer=RainbowLexer()).strip())
         elif choice == 'search_content':
             keyword = prompt("Enter keyword to search for: ", lexer=RainbowLexer())
             builder.search_content_command(keyword)
-        elif choice == 'display_notes':
-            note_manager.display_notes()
+        elif choice.split()[:1] == ['display_notes']:
+            builder.display_notes_command(choice[len('display_notes'):])
         elif choice == "sort":
-            sort_choice = prompt('Enter sort type: ', completer=Sort_Completer, lexer=RainbowLexer())
+            sort_choice = prompt('Enter sort type (name, tags, tag_count, date) [desc] [N]: ',
+                                 completer=Sort_Completer, lexer=RainbowLexer())
             builder.sort_notes_command(sort_choice)
         elif choice == 'exit':
+            note_manager.close()
             print("Good bye!")
             break
 
@@ -0,0 +1,180 @@
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+
+FRONT_MATTER = re.compile(r'\A---\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)', re.S)
+UNSAFE_FILENAME = re.compile(r'[^\w\- ]+')
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+# Spawned workers take about 0.1 s to start, and a Markdown file costs well under
+# a millisecond to read and parse, so the pool needs far more files than the
+# duplicate hashing in sort.duplicates (64), which reads at least 64 KB per file
+POOL_THRESHOLD = 256
+CHUNK_SIZE = 256
+# Files handed to the pool at a time; at most two batches of notes are in memory
+BATCH_SIZE = 4096
+
+
+def parse_tags(value):
+    value = value.strip()
+    if value.startswith('[') and value.endswith(']'):
+        value = value[1:-1]
+    return [tag.strip().strip('\'"') for tag in value.split(',') if tag.strip().strip('\'"')]
+
+
+def normalize_date(value):
+    try:
+        return datetime.fromisoformat(value.strip()).strftime(DATE_FORMAT)
+    except ValueError:
+        return value.strip() or None
+
+
+def parse_markdown(text, default_title=''):
+    """Note fields from a Markdown text with optional front matter:
+
+    ---
+    title: Shopping
+    tags: [home, weekly]
+    created_at: 2024-05-01 18:30
+    ---
+    body...
+    """
+    note = {'title': default_title, 'content': text, 'tags': [], 'created_at': None}
+    match = FRONT_MATTER.match(text)
+    if match is None:
+        return note
+    note['content'] = text[match.end():]
+    key = None
+    for line in match.group(1).splitlines():
+        item = line.strip()
+        if item.startswith('- ') and key == 'tags':
+            # YAML block list under "tags:"
+            note['tags'].extend(parse_tags(item[2:]))
+            continue
+        key, _, value = line.partition(':')
+        key = key.strip().lower()
+        if key == 'title':
+            note['title'] = value.strip().strip('\'"')
+        elif key == 'tags':
+            note['tags'] = parse_tags(value)
+        elif key in ('created_at', 'date'):
+            note['created_at'] = normalize_date(value)
+    return note
+
+
+def read_markdown_file(path):
+    """(note dict, None), or (None, error) for a file that cannot be read as UTF-8 text."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            text = file.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return None, str(e)
+    return parse_markdown(text, os.path.splitext(os.path.basename(path))[0]), None
+
+
+def markdown_files(directory):
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith('.md'):
+                yield entry.path
+
+
+def _read_in_pool(paths, workers):
+    # The next batch is read while the caller consumes the current one
+    # Not forked: the note log's background writer thread may be running
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        current = None
+        for start in range(0, len(paths), BATCH_SIZE):
+            following = pool.map(read_markdown_file, paths[start:start + BATCH_SIZE], chunksize=CHUNK_SIZE)
+            if current is not None:
+                yield from current
+            current = following
+        if current is not None:
+            yield from current
+
+
+def read_markdown_dir(directory, workers=None):
+    """(file name, note dict, error) per .md file in directory, in file name order; note or error is None."""
+    paths = sorted(markdown_files(directory))
+    if len(paths) < POOL_THRESHOLD:
+        results = map(read_markdown_file, paths)
+    else:
+        results = _read_in_pool(paths, workers)
+    for path, (note, error) in zip(paths, results):
+        yield os.path.basename(path), note, error
+
+
+def note_from_json(data):
+    """Note dict from one decoded JSONL object; raises ValueError for anything else."""
+    if not isinstance(data, dict):
+        raise ValueError('not a JSON object')
+    title, content, created_at = data.get('title', ''), data.get('content', ''), data.get('created_at')
+    if not isinstance(title, str) or not isinstance(content, str):
+        raise ValueError('title and content must be strings')
+    if created_at is not None and not isinstance(created_at, str):
+        raise ValueError('created_at must be a string')
+    tags = data.get('tags') or []
+    if isinstance(tags, str):
+        tags = parse_tags(tags)
+    elif not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError('tags must be a list of strings')
+    return {'title': title, 'content': content, 'tags': tags, 'created_at': created_at}
+
+
+def read_jsonl(path):
+    """('line N', note dict, error) per non-empty line, read as the caller goes; one of note and error is None."""
+    # json.loads is fast enough that sending lines to worker processes would cost more than it saves
+    with open(path, 'rb') as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield f'line {number}', note_from_json(json.loads(line.decode('utf-8'))), None
+            except ValueError as e:
+                yield f'line {number}', None, str(e)
+
+
+def read_notes(path, workers=None):
+    """(where, note dict, error) from a directory of Markdown files or a .jsonl file, streamed."""
+    if os.path.isdir(path):
+        return read_markdown_dir(path, workers)
+    return read_jsonl(path)
+
+
+def to_markdown(note):
+    return (f"---\ntitle: {note.title}\ntags: [{', '.join(note.tags)}]\n"
+            f"created_at: {note.created_at or ''}\n---\n{note.content}")
+
+
+def markdown_filename(note):
+    slug = UNSAFE_FILENAME.sub('', note.title).strip().replace(' ', '_')[:40]
+    return f'{note.id:06d}-{slug}.md' if slug else f'{note.id:06d}.md'
+
+
+def write_markdown_dir(notes, directory):
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for note in notes:
+        with open(os.path.join(directory, markdown_filename(note)), 'w', encoding='utf-8') as file:
+            file.write(to_markdown(note))
+        count += 1
+    return count
+
+
+def write_jsonl(notes, path):
+    count = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        for note in notes:
+            file.write(json.dumps(note.to_dict(), ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def write_notes(notes, path):
+    """Export to a .jsonl file, or to a directory of Markdown files for any other path."""
+    if path.lower().endswith('.jsonl'):
+        return write_jsonl(notes, path)
+    return write_markdown_dir(notes, path)
@@ -0,0 +1,179 @@
+import json
+import mmap
+import os
+
+from persistence import DebouncedWriter, StoreLock, atomic_write
+
+
+class NoteLog:
+    """notes.jsonl: one JSON object per line, appended on every change.
+
+    {"op": "put", "note": {...}} stores a whole note, {"op": "delete", "id": 3}
+    removes one, and {"op": "meta", "next_id": 12} (written at the top by
+    compaction) keeps ids from being reused after their notes were dropped.
+
+    Several sessions may share the log. Reads and writes go under `lock`;
+    (generation, end) is the version of the log this session has seen, so
+    what others appended since is read from `end` on, and a generation bumped
+    by someone else's compaction means loading again.
+    """
+
+    def __init__(self, path, compact_min=1000, sync_interval=1.0):
+        self.path = path
+        self.compact_min = compact_min
+        self.lines = 0
+        self.lock = StoreLock(path)
+        self.generation = None
+        self.end = 0
+        self._file = None
+        self._reader = None  # the log this session loaded, even after another one replaced it
+        self._map = None
+        self._syncer = DebouncedWriter(self.sync, sync_interval)
+
+    def records(self, start=0):
+        """Stream the log from byte start as (offset, record); a torn last line from a crash is cut off."""
+        if start == 0:
+            self._close_files()
+            self.generation = self.lock.generation()
+            self.lines = 0
+        self.end = start
+        if not os.path.exists(self.path):
+            return
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        offset = start
+        with open(self.path, 'rb') as file:
+            file.seek(start)
+            for line in file:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete line')
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.lines += 1
+                yield offset, record
+                offset += len(line)
+                self.end = offset
+        if offset != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as file:
+                file.truncate(offset)
+
+    def replaced(self):
+        """Whether another session rewrote the log since this one loaded it."""
+        return self.lock.generation() != self.generation
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        # Other sessions may have appended since this handle last wrote
+        self._file.seek(0, os.SEEK_END)
+        return self._file.tell()
+
+    def _wrote(self, count):
+        self._file.flush()
+        self.end = self._file.tell()
+        self.lines += count
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+
+    def append(self, record):
+        offset = self._open()
+        self._file.write(json.dumps(record).encode() + b'\n')
+        self._wrote(1)
+        self._syncer.mark_dirty()
+        return offset
+
+    def append_many(self, records):
+        """Append records with a single write and fsync; returns their offsets."""
+        offset = self._open()
+        offsets, lines = [], []
+        for record in records:
+            line = json.dumps(record).encode() + b'\n'
+            offsets.append(offset)
+            offset += len(line)
+            lines.append(line)
+        self._file.write(b''.join(lines))
+        self._wrote(len(lines))
+        self.sync()
+        return offsets
+
+    def read_content(self, offset):
+        """Content of the put record at offset, read through a memory map of the log."""
+        if self._map is None or offset >= len(self._map):
+            self._remap()
+        end = self._map.find(b'\n', offset)
+        return json.loads(self._map[offset:end])['note']['content']
+
+    def _remap(self):
+        self._close_map()
+        if self._file is not None:
+            self._file.flush()
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        self._map = mmap.mmap(self._reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _close_files(self):
+        # Windows cannot replace a file that is still open or mapped
+        self._syncer.flush()
+        self._close_map()
+        for file in (self._file, self._reader):
+            if file is not None:
+                file.close()
+        self._file = self._reader = None
+
+    def needs_compaction(self, live):
+        # Superseded puts and deletes outnumber the live notes
+        return self.lines >= self.compact_min and self.lines > 2 * live
+
+    def compact(self, notes, next_id):
+        """Rewrite the log as one put per live note; returns the new line offsets in note order.
+
+        notes may be a generator that still reads contents from the old log.
+        """
+        offsets = []
+
+        def write(file):
+            file.write(json.dumps({'op': 'meta', 'next_id': next_id}).encode() + b'\n')
+            for note in notes:
+                offsets.append(file.tell())
+                file.write(json.dumps({'op': 'put', 'note': note}).encode() + b'\n')
+
+        atomic_write(self.path, write, before_replace=self._close_files)
+        self._reader = open(self.path, 'rb')
+        self.generation = self.lock.bump()
+        self.end = os.path.getsize(self.path)
+        self.lines = len(offsets) + 1
+        return offsets
+
+    def migrate(self, legacy_path):
+        """Convert a notes.json array file into the log, once."""
+        if os.path.exists(self.path) or not os.path.exists(legacy_path):
+            return False
+        with open(legacy_path, 'r') as file:
+            data = json.load(file)
+        next_id = max((note.get('id') or 0 for note in data), default=0) + 1
+        for note in data:
+            if note.get('id') is None:
+                note['id'] = next_id
+                next_id += 1
+        self.compact(data, next_id)
+        self.lines = 0
+        return True
+
+    def sync(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        # Stops the sync thread and its atexit hook before the files they sync go away
+        try:
+            self._syncer.close()
+        finally:
+            self._close_files()
@@ -17,10 +17,13 @@ class RainbowLexer(Lexer):
 
 
 Completer = NestedCompleter.from_nested_dict({'add_note'   : None, 'edit_note'      : None, 'delete_note': None,
-                                            'search_tag'  : None, 'search_content': None, 'display_notes': None,
-                                            'edit_note'    : None, 'exit'             : None, 'sort'         : None})
+                                            'search_tag'  : None, 'search_content': None, 'display_notes': {'compact': None},
+                                            'tags'         : None, 'exit'             : None, 'sort'         : None,
+                                            'stats'        : None, 'import'           : None, 'export'       : None,
+                                            'similar'      : None, 'dedupe'           : None})
 
-Sort_Completer = NestedCompleter.from_nested_dict({'sort_tags' : None, 'sort_name'  : None, 'sort_date' : None})
+Sort_Completer = NestedCompleter.from_nested_dict({'tags'     : {'desc': None}, 'name': {'desc': None},
+                                                  'tag_count': {'desc': None}, 'date': {'desc': None}})
 
 
      
\ No newline at end of file
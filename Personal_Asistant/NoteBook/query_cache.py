@@ -0,0 +1,38 @@
+from collections import OrderedDict
+
+
+class QueryCache:
+    """Least-recently-used query results, dropped wholesale when the generation moves.
+
+    Callers bump the generation on every change to the notes instead of working
+    out which cached queries the change affects.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._generation = 0
+
+    def invalidate(self):
+        self.generation += 1
+
+    def get(self, key, compute):
+        if self._generation != self.generation:
+            self._results.clear()
+            self._generation = self.generation
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return self._results[key]
+        self.misses += 1
+        result = self._results[key] = compute()
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+        return result
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._results),
+                'maxsize': self.maxsize, 'generation': self.generation}
@@ -0,0 +1,129 @@
+from collections import defaultdict
+from zlib import crc32
+
+from .text_index import tokenize
+
+
+SHINGLE_WORDS = 3
+HASH_RANGE = 1 << 32
+
+
+def shingles(text):
+    """crc32 hashes of the note's overlapping three-word phrases (or of its words, if it is shorter)."""
+    words = tokenize(text)
+    if len(words) < SHINGLE_WORDS:
+        return {crc32(word.encode()) for word in words}
+    return {crc32(' '.join(words[i:i + SHINGLE_WORDS]).encode()) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(hashes, size):
+    """MinHash signature by one-permutation hashing: each hash lands in one of `size` bins and
+    every bin keeps its minimum, so a note costs one pass over its shingles rather than one
+    per permutation. Empty bins borrow from the next filled bin to the right, shifted so
+    that borrowed values don't collide with the originals.
+    """
+    if not hashes:
+        return None
+    width = HASH_RANGE // size
+    bins = [None] * size
+    for value in hashes:
+        i, rest = divmod(value, width)
+        if bins[i] is None or rest < bins[i]:
+            bins[i] = rest
+    filled = list(bins)
+    for i in range(size):
+        if filled[i] is None:
+            distance = 1
+            while filled[(i + distance) % size] is None:
+                distance += 1
+            bins[i] = filled[(i + distance) % size] + distance * width
+    return tuple(bins)
+
+
+class MinHashIndex:
+    """MinHash signatures of note contents, banded for locality-sensitive hashing.
+
+    Notes whose signatures agree on all rows of at least one band share a
+    bucket; only those pairs get compared. With 16 bands of 4 rows, pairs at
+    50% similarity meet about two times in three, pairs at 70% or more in 99
+    cases of 100, and unrelated notes practically never.
+    """
+
+    def __init__(self, size=64, bands=16):
+        self.size = size
+        self.bands = bands
+        self.rows = size // bands
+        self.signatures = {}
+        self.buckets = defaultdict(set)  # (band, rows of the signature) -> note ids
+
+    def _keys(self, sig):
+        return [(band, sig[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def add(self, note_id, text):
+        self.remove(note_id)
+        sig = signature(shingles(text), self.size)
+        if sig is None:
+            return
+        self.signatures[note_id] = sig
+        for key in self._keys(sig):
+            self.buckets[key].add(note_id)
+
+    def remove(self, note_id):
+        sig = self.signatures.pop(note_id, None)
+        if sig is None:
+            return
+        for key in self._keys(sig):
+            ids = self.buckets[key]
+            ids.discard(note_id)
+            if not ids:
+                del self.buckets[key]
+
+    def estimate(self, a, b):
+        """Estimated Jaccard similarity of two notes' shingle sets."""
+        sig_a, sig_b = self.signatures[a], self.signatures[b]
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / self.size
+
+    def candidates(self, note_id):
+        sig = self.signatures.get(note_id)
+        if sig is None:
+            return set()
+        found = set().union(*(self.buckets[key] for key in self._keys(sig)))
+        found.discard(note_id)
+        return found
+
+    def similar(self, note_id, threshold=0.5, limit=10):
+        """(note id, estimated similarity) for notes at or above threshold, most similar first."""
+        scored = [(other, self.estimate(note_id, other)) for other in self.candidates(note_id)]
+        scored = [item for item in scored if item[1] >= threshold]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def clusters(self, threshold=0.7):
+        """Groups of note ids linked by pairs at or above threshold, largest first."""
+        parent = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        checked = set()
+        for ids in self.buckets.values():
+            if len(ids) < 2:
+                continue
+            ordered = sorted(ids)
+            for i, a in enumerate(ordered):
+                for b in ordered[i + 1:]:
+                    if (a, b) in checked:
+                        continue
+                    checked.add((a, b))
+                    if self.estimate(a, b) >= threshold:
+                        root_a, root_b = find(a), find(b)
+                        if root_a != root_b:
+                            parent[max(root_a, root_b)] = min(root_a, root_b)
+        groups = defaultdict(list)
+        for note_id in parent:
+            groups[find(note_id)].append(note_id)
+        return sorted((sorted(group) for group in groups.values()), key=lambda group: (-len(group), group[0]))
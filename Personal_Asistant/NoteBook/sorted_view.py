@@ -0,0 +1,47 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from itertools import islice
+
+
+def created_key(note):
+    try:
+        return datetime.strptime(note.created_at, '%Y-%m-%d %H:%M')
+    except (TypeError, ValueError):
+        return datetime.min
+
+
+SORT_KEYS = {
+    'name': lambda note: note.title.lower(),
+    # Untagged notes go after tagged ones
+    'tags': lambda note: (0, note.tags[0].lower()) if note.tags else (1, ''),
+    'tag_count': lambda note: len(note.tags),
+    'date': created_key,
+}
+
+
+class SortedView:
+    """Note ids kept in key order; updates are a bisect, reads are a slice."""
+
+    def __init__(self, key):
+        self.key = key
+        self._entries = []  # sorted (key, id)
+        self._keys = {}     # id -> key
+
+    def rebuild(self, notes):
+        self._keys = {note.id: self.key(note) for note in notes}
+        self._entries = sorted((key, note_id) for note_id, key in self._keys.items())
+
+    def add(self, note):
+        self.remove(note.id)
+        key = self.key(note)
+        insort(self._entries, (key, note.id))
+        self._keys[note.id] = key
+
+    def remove(self, note_id):
+        key = self._keys.pop(note_id, None)
+        if key is not None:
+            del self._entries[bisect_left(self._entries, (key, note_id))]
+
+    def ids(self, reverse=False, limit=None):
+        entries = reversed(self._entries) if reverse else iter(self._entries)
+        return [note_id for _, note_id in islice(entries, limit)]
@@ -0,0 +1,147 @@
+import json
+import math
+import os
+import re
+from collections import defaultdict
+
+from persistence import atomic_write
+
+
+TOKEN = re.compile(r'\w+')
+QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def parse_query(query):
+    """Split a query into OR-groups; each group is a list of AND-ed phrases (tuples of terms).
+
+    'red fox OR "lazy dog"' -> [[('red',), ('fox',)], [('lazy', 'dog')]]
+    """
+    groups, group = [], []
+    for phrase, word in QUERY_PART.findall(query):
+        if word and word.upper() == 'OR':
+            if group:
+                groups.append(group)
+            group = []
+            continue
+        terms = tuple(tokenize(phrase if phrase else word))
+        if terms:
+            group.append(terms)
+    if group:
+        groups.append(group)
+    return groups
+
+
+class InvertedIndex:
+    """term -> {note id -> [positions]}, with per-note lengths for BM25 ranking."""
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.total_length = 0
+        self.note_terms = {}  # note id -> distinct terms, so removal touches only those
+
+    def add(self, note_id, text):
+        self.remove(note_id)
+        terms = tokenize(text)
+        positions = {}
+        for position, term in enumerate(terms):
+            positions.setdefault(term, []).append(position)
+        postings = self.postings
+        for term, found in positions.items():
+            postings[term][note_id] = found
+        self.lengths[note_id] = len(terms)
+        self.total_length += len(terms)
+        self.note_terms[note_id] = set(positions)
+
+    def remove(self, note_id):
+        length = self.lengths.pop(note_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.note_terms.pop(note_id, ()):
+            notes = self.postings.get(term)
+            if notes is not None:
+                notes.pop(note_id, None)
+                if not notes:
+                    del self.postings[term]
+
+    def _phrase_matches(self, phrase):
+        candidates = None
+        for term in phrase:
+            notes = self.postings.get(term)
+            if not notes:
+                return set()
+            candidates = set(notes) if candidates is None else candidates & notes.keys()
+        if len(phrase) == 1:
+            return candidates
+        matches = set()
+        for note_id in candidates:
+            positions = [set(self.postings[term][note_id]) for term in phrase]
+            if any(all(start + i in positions[i] for i in range(1, len(phrase))) for start in positions[0]):
+                matches.add(note_id)
+        return matches
+
+    def _score(self, note_id, terms):
+        count = len(self.lengths)
+        average = self.total_length / count if count else 0
+        length = self.lengths[note_id]
+        score = 0.0
+        for term in terms:
+            notes = self.postings.get(term, {})
+            frequency = len(notes.get(note_id, ()))
+            if not frequency:
+                continue
+            idf = math.log((count - len(notes) + 0.5) / (len(notes) + 0.5) + 1)
+            norm = self.k1 * (1 - self.b + self.b * length / average) if average else self.k1
+            score += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return score
+
+    def search(self, query):
+        """Note ids matching query, best BM25 score first."""
+        groups = parse_query(query)
+        matches = set()
+        for group in groups:
+            found = None
+            for phrase in sorted(group, key=lambda p: min(len(self.postings.get(t, ())) for t in p)):
+                hits = self._phrase_matches(phrase)
+                found = hits if found is None else found & hits
+                if not found:
+                    break
+            matches |= found or set()
+        terms = {term for group in groups for phrase in group for term in phrase}
+        return sorted(matches, key=lambda note_id: (-self._score(note_id, terms), note_id))
+
+    def save(self, path, source):
+        # source identifies the notes file state this index was built from
+        data = {'source': source, 'postings': self.postings, 'lengths': self.lengths}
+        atomic_write(path, lambda file: json.dump(data, file), mode='w')
+
+    @classmethod
+    def load(cls, path, source):
+        """The saved index, or None if it is missing or was built from another notes file state."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if data.get('source') != source:
+            return None
+        index = cls()
+        for term, notes in data['postings'].items():
+            index.postings[term] = {int(note_id): positions for note_id, positions in notes.items()}
+        index.lengths = {int(note_id): length for note_id, length in data['lengths'].items()}
+        index.total_length = sum(index.lengths.values())
+        index.note_terms = {note_id: set() for note_id in index.lengths}
+        for term, notes in index.postings.items():
+            for note_id in notes:
+                index.note_terms[note_id].add(term)
+        return index
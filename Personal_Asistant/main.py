@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+import argparse
+import sys
 
 class MenuItem(ABC):
     @abstractmethod
@@ -30,7 +32,22 @@ class GameMenuItem(MenuItem):
         from Game.game import main as game_main
         game_main()
 
+def run_cli(argv):
+    parser = argparse.ArgumentParser(prog='personal-assistant')
+    subparsers = parser.add_subparsers(dest='app', required=True)
+    ab_parser = subparsers.add_parser('ab', help='address book')
+    ab_parser.add_argument('--batch', metavar='FILE', required=True,
+                           help="run commands from a file ('-' for stdin), one JSON object or command line per line")
+    args = parser.parse_args(argv)
+    if args.app == 'ab':
+        from AdressBook.AB import batch_main
+        return batch_main(args.batch)
+
+
 def menu():
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+
     menu_items = {
         '1': AddressBookMenuItem(),
         '2': NoteBookMenuItem(),
@@ -0,0 +1,211 @@
+import atexit
+import os
+import tempfile
+import threading
+import time
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+def atomic_write(filename, write, mode='wb', before_replace=None):
+    """Call write(file) on a temp file next to filename, fsync it and swap it in.
+
+    Readers (and a crash at any point) see either the old file or the new one,
+    never a truncated mix. before_replace() runs right before the swap, e.g. to
+    close handles on the old file that would block it on Windows.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(prefix=os.path.basename(filename) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode) as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        if before_replace is not None:
+            before_replace()
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+    fsync_directory(directory)
+
+
+def fsync_directory(directory):
+    # Makes the rename itself durable; directories cannot be opened on Windows
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+if os.name == 'nt':
+    def _lock_file(file):
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass  # LK_LOCK gives up after about ten seconds; keep waiting
+
+    def _unlock_file(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    def _lock_file(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class StoreLock:
+    """Exclusive lock between processes on `<path>.lock`, which also holds the store's generation.
+
+    Appends leave the generation alone; a writer that rewrites the store (a
+    compaction or a full save) bumps it, telling other sessions that reading
+    what was appended since their last look is not enough and they must load
+    again. Nested use is counted, and the threads of one process share the lock.
+    """
+
+    def __init__(self, path):
+        self.path = path + '.lock'
+        self._file = None
+        self._depth = 0
+        self._mutex = threading.Lock()
+
+    def acquire(self):
+        with self._mutex:
+            if self._depth == 0:
+                file = open(self.path, 'a+b')
+                try:
+                    _lock_file(file)
+                except BaseException:
+                    file.close()
+                    raise
+                self._file = file
+            self._depth += 1
+
+    def release(self):
+        with self._mutex:
+            self._depth -= 1
+            if self._depth == 0:
+                _unlock_file(self._file)
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def generation(self):
+        # Only meaningful while the lock is held
+        self._file.seek(0)
+        try:
+            return int(self._file.read() or 0)
+        except ValueError:
+            return -1  # torn by a crash; differs from what every session saw, so all of them reload
+
+    def bump(self):
+        generation = max(self.generation(), 0) + 1
+        self._file.seek(0)
+        self._file.truncate(0)
+        self._file.write(str(generation).encode())
+        self._file.flush()
+        return generation
+
+
+class DebouncedWriter:
+    """Coalesces bursts of save requests into one call of save() on a worker thread.
+
+    save() runs once the store has been quiet for `interval` seconds (or at the
+    latest `max_delay` seconds after the first unsaved change). flush() saves
+    synchronously and is registered with atexit, so pending changes survive a
+    normal exit.
+    """
+
+    def __init__(self, save, interval=1.0, max_delay=None):
+        self.save = save
+        self.interval = interval
+        self.max_delay = max_delay if max_delay is not None else interval * 10
+        self.error = None
+        self._condition = threading.Condition()
+        self._dirty_since = None
+        self._deadline = None
+        self._saving = False
+        self._closed = False
+        self._thread = None
+        atexit.register(self.close)
+
+    def mark_dirty(self):
+        with self._condition:
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._deadline = min(now + self.interval, self._dirty_since + self.max_delay)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _run(self):
+        with self._condition:
+            while not self._closed:
+                if self._dirty_since is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._save_locked()
+
+    def _save_locked(self):
+        # Called with the condition held; releases it while save() runs so new
+        # changes can be marked in the meantime.
+        self._dirty_since = self._deadline = None
+        self._saving = True
+        self._condition.release()
+        try:
+            self.save()
+            self.error = None
+        except Exception as e:
+            self.error = e
+        finally:
+            self._condition.acquire()
+            self._saving = False
+            self._condition.notify_all()
+
+    def flush(self):
+        with self._condition:
+            while self._saving:
+                self._condition.wait()
+            if self._dirty_since is not None:
+                self._save_locked()
+            # Reported once: a later successful save is not shadowed by an old failure
+            error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+            # A closed writer is not kept alive by the atexit registry
+            atexit.unregister(self.close)
@@ -0,0 +1,153 @@
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tarfile
+import zipfile
+import zlib
+
+try:
+    from rarfile import RarFile, Error as RarError
+except ImportError:  # optional: without it .rar archives are sorted but not unpacked
+    RarFile = None
+    RarError = zipfile.BadZipFile
+
+
+CHUNK_SIZE = 1024 * 1024
+# Zip-bomb limits per archive: everything unpacked, number of entries, unpacked/packed ratio
+MAX_SIZE = 4 * 1024 ** 3
+MAX_ENTRIES = 100000
+MAX_RATIO = 100
+# Small archives of text may legitimately unpack to many times their size
+RATIO_ALLOWANCE = 1024 ** 2
+
+SUFFIXES = (
+    ('.tar.gz', 'tar'), ('.tgz', 'tar'), ('.tar.bz2', 'tar'), ('.tbz2', 'tar'),
+    ('.tar.xz', 'tar'), ('.txz', 'tar'), ('.tar', 'tar'), ('.zip', 'zip'), ('.rar', 'rar'),
+    ('.gz', 'gz'), ('.bz2', 'bz2'), ('.xz', 'xz'),
+)
+OPENERS = {'gz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _match(name):
+    lower = name.lower()
+    for suffix, kind in SUFFIXES:
+        if lower.endswith(suffix) and len(lower) > len(suffix):
+            return suffix, kind
+    return None, None
+
+
+def archive_kind(name):
+    """'zip', 'tar', 'rar', 'gz', 'bz2' or 'xz' by the file name, or None."""
+    return _match(name)[1]
+
+
+def archive_stem(name):
+    suffix, kind = _match(name)
+    return name[:-len(suffix)] if suffix else name
+
+
+def partial_folder(folder):
+    parent, name = os.path.split(folder)
+    return os.path.join(parent, f'.{name}.part')
+
+
+class _Extraction:
+    def __init__(self, archive, folder, max_size, max_entries, max_ratio):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.max_ratio = max_ratio
+        self.max_size = min(max_size, os.path.getsize(archive) * max_ratio + RATIO_ALLOWANCE)
+        self.entries = 0
+        self.size = 0
+
+    def path(self, name):
+        # Absolute names and .. would put the entry outside the folder
+        parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+        if not parts or '..' in parts or name.startswith(('/', '\\')) or ':' in parts[0]:
+            raise ArchiveError(f'небезпечний шлях у архіві: {name!r}')
+        return os.path.join(self.folder, *parts)
+
+    def entry(self):
+        self.entries += 1
+        if self.entries > self.max_entries:
+            raise ArchiveError(f'більше {self.max_entries} файлів в архіві')
+
+    def directory(self, name):
+        self.entry()
+        os.makedirs(self.path(name), exist_ok=True)
+
+    def file(self, name, source, packed=None, unpacked=None):
+        """Copy one entry in chunks, counting what is actually written against the limits."""
+        self.entry()
+        if packed and unpacked and unpacked > packed * self.max_ratio + RATIO_ALLOWANCE:
+            raise ArchiveError(f'{name}: стиснення у {unpacked // packed} разів схоже на zip-бомбу')
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                self.size += len(chunk)
+                if self.size > self.max_size:
+                    raise ArchiveError(f'розпакований вміст перевищує {self.max_size} байт')
+                file.write(chunk)
+
+
+def _extract_members(archive, kind, extraction):
+    if kind in ('zip', 'rar'):
+        if kind == 'rar' and RarFile is None:
+            raise ArchiveError('для .rar потрібен пакет rarfile')
+        with (zipfile.ZipFile if kind == 'zip' else RarFile)(archive) as packed:
+            members = packed.infolist()
+            if len(members) > extraction.max_entries:
+                raise ArchiveError(f'більше {extraction.max_entries} файлів в архіві')
+            for info in members:
+                if info.is_dir():
+                    extraction.directory(info.filename)
+                else:
+                    with packed.open(info) as source:
+                        extraction.file(info.filename, source, info.compress_size, info.file_size)
+    elif kind == 'tar':
+        # Stream mode reads the archive front to back once, whatever the compression;
+        # links and device files are skipped
+        with tarfile.open(archive, 'r|*') as packed:
+            for member in packed:
+                if member.isdir():
+                    extraction.directory(member.name)
+                elif member.isfile():
+                    extraction.file(member.name, packed.extractfile(member))
+    else:
+        with OPENERS[kind](archive, 'rb') as source:
+            extraction.file(archive_stem(os.path.basename(archive)), source)
+
+
+def extract(archive, folder, max_size=MAX_SIZE, max_entries=MAX_ENTRIES, max_ratio=MAX_RATIO):
+    """Unpack archive into folder, which must not exist yet; returns (entries, bytes).
+
+    Entries are streamed in chunks, so memory use does not depend on the archive.
+    The files appear in a hidden folder first, renamed to folder once complete;
+    an archive that breaks a limit or cannot be read leaves nothing behind and
+    raises ArchiveError.
+    """
+    kind = archive_kind(archive)
+    if kind is None:
+        raise ArchiveError('невідомий формат архіву')
+    temp = partial_folder(folder)
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+    extraction = _Extraction(archive, temp, max_size, max_entries, max_ratio)
+    try:
+        _extract_members(archive, kind, extraction)
+        os.rename(temp, folder)
+    except BaseException as e:
+        shutil.rmtree(temp, ignore_errors=True)
+        # zipfile raises RuntimeError for encrypted entries
+        if isinstance(e, (OSError, EOFError, zlib.error, lzma.LZMAError, zipfile.BadZipFile,
+                          tarfile.TarError, RarError, NotImplementedError, RuntimeError)):
+            raise ArchiveError(str(e)) from e
+        raise
+    return extraction.entries, extraction.size
@@ -0,0 +1,83 @@
+import json
+import os
+
+
+CATEGORIES = {
+    'images': ('.jpg', '.png', '.jpeg', '.svg'),
+    'videos': ('.avi', '.mp4', '.mov', '.mkv'),
+    'documents': ('.doc', '.docx', '.txt', '.pdf', '.xlsx', '.pptx'),
+    'music': ('.mp3', '.ogg', '.wav', '.amr'),
+    'archives': ('.zip', '.gz', '.tar', '.rar', '.tgz', '.bz2', '.xz'),  # Додано підтримку .rar
+    'python': ('.py',),
+}
+
+# (offset, leading bytes, extension they stand for); checked in order
+SIGNATURES = (
+    (0, b'\xff\xd8\xff', '.jpg'),
+    (0, b'\x89PNG\r\n\x1a\n', '.png'),
+    (0, b'GIF87a', '.gif'),
+    (0, b'GIF89a', '.gif'),
+    (0, b'%PDF-', '.pdf'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', '.doc'),
+    (0, b'PK\x03\x04', '.zip'),
+    (0, b'Rar!\x1a\x07', '.rar'),
+    (0, b'\x1f\x8b', '.gz'),
+    (0, b'BZh', '.bz2'),
+    (0, b'\xfd7zXZ\x00', '.xz'),
+    (257, b'ustar', '.tar'),
+    (0, b'ID3', '.mp3'),
+    (0, b'\xff\xfb', '.mp3'),
+    (0, b'OggS', '.ogg'),
+    (0, b'#!AMR', '.amr'),
+    (8, b'WAVE', '.wav'),
+    (8, b'AVI ', '.avi'),
+    (4, b'ftypqt', '.mov'),
+    (4, b'ftyp', '.mp4'),
+    (0, b'\x1aE\xdf\xa3', '.mkv'),
+)
+SNIFF_SIZE = max(offset + len(magic) for offset, magic, extension in SIGNATURES)
+
+
+def extension_table(categories):
+    """extension -> category folder; an extension listed twice stays with the first category."""
+    table = {}
+    for folder, extensions in categories.items():
+        for extension in extensions:
+            table.setdefault(extension, folder)
+    return table
+
+
+def load_config(path):
+    """(categories, sniff) from a JSON file like
+
+    {"categories": {"images": [".jpg", "png"], "books": [".epub"]}, "sniff": true}
+
+    The categories replace the built-in ones. Without the file, the built-in ones
+    are used and sniffing is off.
+    """
+    if not os.path.exists(path):
+        return CATEGORIES, False
+    with open(path, 'r', encoding='utf-8') as file:
+        config = json.load(file)
+    categories = {}
+    for folder, extensions in config.get('categories', CATEGORIES).items():
+        if isinstance(extensions, str):
+            extensions = [extensions]
+        categories[folder.lower()] = tuple(
+            extension.lower() if extension.startswith('.') else '.' + extension.lower() for extension in extensions)
+    return categories, bool(config.get('sniff', False))
+
+
+def sniff(path):
+    """Extension matching the first bytes of the file, or None."""
+    try:
+        with open(path, 'rb') as file:
+            head = file.read(SNIFF_SIZE)
+    except OSError:
+        return None
+    for offset, magic, extension in SIGNATURES:
+        if head.startswith(magic, offset):
+            return extension
+    if head.startswith(b'#!') and b'python' in head.split(b'\n', 1)[0]:
+        return '.py'
+    return None
@@ -0,0 +1,78 @@
+import hashlib
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+
+PARTIAL_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+# Below this many files to hash, starting the worker processes costs more than it saves
+POOL_THRESHOLD = 64
+POLICIES = ('report', 'skip', 'hardlink')
+
+
+def partial_hash(path):
+    try:
+        with open(path, 'rb') as file:
+            return hashlib.blake2b(file.read(PARTIAL_SIZE)).hexdigest()
+    except OSError:
+        return None
+
+
+def full_hash(path):
+    digest = hashlib.blake2b()
+    try:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _hash_all(hash_file, paths, pool):
+    if pool is None:
+        return dict(zip(paths, map(hash_file, paths)))
+    return dict(zip(paths, pool.map(hash_file, paths, chunksize=max(1, len(paths) // 64))))
+
+
+def _split(groups, hashes):
+    found = []
+    for paths in groups:
+        by_hash = defaultdict(list)
+        for path in paths:
+            if hashes[path] is not None:
+                by_hash[hashes[path]].append(path)
+        found.extend(same for same in by_hash.values() if len(same) > 1)
+    return found
+
+
+def find_duplicates(files, workers=None):
+    """Groups of files with identical contents among (path, size) pairs.
+
+    Files of a size nobody else has are ruled out without reading them, a hash
+    of the first 64 KB rules out most of the rest, and only files that agree on
+    both are read in full. Groups and their files keep the order of files;
+    empty files are left out, and unreadable ones never match.
+    """
+    by_size = defaultdict(list)
+    for path, size in files:
+        if size:
+            by_size[size].append(path)
+    groups = [paths for paths in by_size.values() if len(paths) > 1]
+    sizes = {path: size for size, paths in by_size.items() if len(paths) > 1 for path in paths}
+    candidates = list(sizes)
+    # Spawned, not forked, like the extraction pool: the sort runs worker threads
+    pool = (ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            if len(candidates) >= POOL_THRESHOLD else None)
+    try:
+        groups = _split(groups, _hash_all(partial_hash, candidates, pool))
+        # Files no longer than the partial hash are already compared in full
+        longer = [paths for paths in groups if sizes[paths[0]] > PARTIAL_SIZE]
+        found = [paths for paths in groups if sizes[paths[0]] <= PARTIAL_SIZE]
+        found.extend(_split(longer, _hash_all(full_hash, [path for paths in longer for path in paths], pool)))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    order = {path: i for i, (path, size) in enumerate(files)}
+    return sorted(found, key=lambda paths: order[paths[0]])
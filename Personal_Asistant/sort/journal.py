@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+
+from persistence import atomic_write
+
+
+PLAN_NAME = '.sort_plan.jsonl'
+PROGRESS_NAME = '.sort_plan.progress'
+
+
+class SortJournal:
+    """The moves of one sort run, written down before any file is touched.
+
+    .sort_plan.jsonl in the sorted folder holds an {"op": "mkdir"} line for each
+    folder the run creates, an {"op": "move", "src", "dst"} line per file (paths
+    relative to the folder; "link" names the file a duplicate becomes a hard
+    link to, "extract" the folder an archive is unpacked into) and a closing
+    {"op": "end"} line with the report.
+    .sort_plan.progress gets "+<n>" once move n is done and "-<n>" once it is
+    undone, so an interrupted apply or undo carries on where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.plan_path = os.path.join(path, PLAN_NAME)
+        self.progress_path = os.path.join(path, PROGRESS_NAME)
+        self._progress = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def owns(name):
+        # The plan, its progress and atomic_write's temp file are not the user's files
+        return name.startswith(PLAN_NAME) or name == PROGRESS_NAME
+
+    def exists(self):
+        return os.path.exists(self.plan_path)
+
+    def write(self, records):
+        """Stream records into a new plan; the progress of the previous one goes with it."""
+        def write(file):
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False).encode() + b'\n')
+
+        self.close()
+        atomic_write(self.plan_path, write, before_replace=self._remove_progress)
+
+    def records(self):
+        with open(self.plan_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                yield json.loads(line)
+
+    def summary(self):
+        summary = None
+        for record in self.records():
+            if record['op'] == 'end':
+                summary = record
+        return summary
+
+    def folders(self):
+        return [self._full(record['path']) for record in self.records() if record['op'] == 'mkdir']
+
+    def groups(self, done, undo=False):
+        """Moves as lists of (index, src, dst, link, extract), in plan order.
+
+        A list holds the moves to one destination, and the moves that link to
+        it, which follow it in the plan. Only moves not yet done are given (done
+        ones, with undo). Moves in one list must run in order, and reversed for
+        undo; different lists are independent.
+        """
+        group, dst, index = [], None, 0
+        for record in self.records():
+            if record['op'] != 'move':
+                continue
+            link = record.get('link')
+            if record['dst'] != dst and link is None:
+                if group:
+                    yield group[::-1] if undo else group
+                group, dst = [], record['dst']
+            if done[index] == undo:
+                extract = record.get('extract')
+                group.append((index, self._full(record['src']), self._full(record['dst']),
+                              None if link is None else self._full(link),
+                              None if extract is None else self._full(extract)))
+            index += 1
+        if group:
+            yield group[::-1] if undo else group
+
+    def extractions(self, done):
+        """(archive, folder) of the moved archives that are not unpacked yet."""
+        index = 0
+        for record in self.records():
+            if record['op'] != 'move':
+                continue
+            if done[index] and 'extract' in record and not os.path.isdir(self._full(record['extract'])):
+                yield self._full(record['dst']), self._full(record['extract'])
+            index += 1
+
+    def state(self, count):
+        """Per move, 1 if it is done and 0 if it is pending or was undone."""
+        done = bytearray(count)
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, 'r') as file:
+                for line in file:
+                    if line.endswith('\n'):
+                        done[int(line[1:])] = line[0] == '+'
+        return done
+
+    def pending(self):
+        if not self.exists():
+            return False
+        summary = self.summary()
+        return summary is not None and sum(self.state(summary['moves'])) < summary['moves']
+
+    def mark(self, index, done=True):
+        # Flushed per entry, so a killed run loses at most the move in flight;
+        # apply and undo recognise a move that was made but never marked
+        with self._lock:
+            if self._progress is None:
+                self._progress = open(self.progress_path, 'a')
+            self._progress.write(f"{'+' if done else '-'}{index}\n")
+            self._progress.flush()
+
+    def remove(self):
+        self.close()
+        for filename in (self.plan_path, self.progress_path):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def close(self):
+        with self._lock:
+            if self._progress is not None:
+                self._progress.flush()
+                os.fsync(self._progress.fileno())
+                self._progress.close()
+                self._progress = None
+
+    def _remove_progress(self):
+        if os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+
+    def relative(self, path):
+        return os.path.relpath(path, self.path)
+
+    def _full(self, path):
+        return os.path.join(self.path, path)
@@ -1,117 +1,493 @@
+import errno
+import multiprocessing
 import os
+import queue
 import shutil
-import zipfile
+import threading
 from abc import ABC, abstractmethod
-from rarfile import RarFile
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .archives import MAX_ENTRIES, MAX_RATIO, MAX_SIZE, ArchiveError, archive_kind, archive_stem, extract, partial_folder
+from .categories import CATEGORIES, extension_table, load_config, sniff
+from .duplicates import POLICIES, find_duplicates
+from .journal import SortJournal
+
+# Moves on network disks wait on I/O, not on the CPU, so more threads than cores pay off
+WORKERS = 8
+QUEUE_SIZE = 1024
 
 class ExtensionStrategy(ABC):
-    @abstractmethod
-    def process_file(self, file_sorter, root, file):
-        pass
+    extract_limits = None
 
     @abstractmethod
     def print_results(self, file_sorter):
         pass
 
+    def plan_file(self, file_sorter, root, file):
+        """Where file should be moved to, or None to leave it in place."""
+        return None
+
+    def extract_to(self, path):
+        """Folder to unpack the archive moved to path into, or None to leave it packed."""
+        return None
+
 class DefaultExtensionStrategy(ExtensionStrategy):
-    extensions = {
-        'images': ('.jpg', '.png', '.jpeg', '.svg'),
-        'videos': ('.avi', '.mp4', '.mov', '.mkv'),
-        'documents': ('.doc', '.docx', '.txt', '.pdf', '.xlsx', '.pptx'),
-        'music': ('.mp3', '.ogg', '.wav', '.amr'),
-        'archives': ('.zip', '.gz', '.tar', '.rar'),  # Додано підтримку .rar
-        'python': ('.py')
-    }
-
-    def __init__(self):
+    extensions = CATEGORIES
+
+    def __init__(self, extensions=None, sniff=False):
+        if extensions is not None:
+            self.extensions = extensions
+        self.by_extension = extension_table(self.extensions)
+        # Files with no or an unknown extension are recognised by their first bytes
+        self.sniff = sniff
         self.unknown_extensions = set()
         self.for_print = {key: [] for key in self.extensions.keys()}
 
-    def process_file(self, file_sorter, root, file):
-        filename, extension = os.path.splitext(file)
-        found = False
-        for folder, exts in self.extensions.items():
-            if extension.lower() in exts:
-                new_path = os.path.join(root, folder, file_sorter.normalize(file))
-                os.makedirs(os.path.dirname(new_path), exist_ok=True)
-                shutil.move(os.path.join(root, file), new_path)
-                found = True
-                self.add_and_print_extensions(file_sorter, folder, extension.lower())
-                break
-        if not found:
-            self.add_and_print_extensions(file_sorter, None, extension.lower())
+    @classmethod
+    def from_config(cls, path):
+        extensions, sniff = load_config(path)
+        return cls(extensions, sniff)
+
+    def classify(self, path):
+        """(category folder or None, extension) of the file at path."""
+        extension = os.path.splitext(path)[1].lower()
+        folder = self.by_extension.get(extension)
+        if folder is None and self.sniff:
+            sniffed = sniff(path)
+            if sniffed in self.by_extension:
+                return self.by_extension[sniffed], sniffed
+        return folder, extension
+
+    def plan_file(self, file_sorter, root, file):
+        folder, extension = self.classify(os.path.join(root, file))
+        self.add_and_print_extensions(file_sorter, folder, extension)
+        if folder is None:
+            return None
+        with file_sorter.lock:
+            file_sorter.moved[folder] += 1
+        return os.path.join(root, folder, file_sorter.normalize(file))
 
     def add_and_print_extensions(self, file_sorter, folder, extension):
-        if folder in file_sorter.for_print:
-            if extension not in file_sorter.for_print[folder]:
-                file_sorter.for_print[folder].append(extension)
-        else:
-            file_sorter.unknown_extensions.add(extension)
+        with file_sorter.lock:
+            if folder in file_sorter.for_print:
+                if extension not in file_sorter.for_print[folder]:
+                    file_sorter.for_print[folder].append(extension)
+            else:
+                file_sorter.unknown_extensions.add(extension)
 
     def print_results(self, file_sorter):
+        # Sorted, so the report does not depend on which worker finished first
         print('Знайдені розширення:')
         for folder, extensions in file_sorter.for_print.items():
             if extensions:
-                print(f'{folder}: {", ".join(extensions)}')
+                print(f'{folder} ({file_sorter.moved[folder]}): {", ".join(sorted(extensions))}')
 
         print('Невідомі розширення:')
-        print(', '.join(file_sorter.unknown_extensions))
-        print('Сортування завершено. Вихід у головне меню')
-
-class ZipExtensionStrategy(ExtensionStrategy):
-    def process_file(self, file_sorter, root, file):
-        filename, extension = os.path.splitext(file)
-        if extension.lower() in file_sorter.extensions['archives']:
-            file_sorter.for_print['archives'].append(extension.lower())
-            self.extract_zip(os.path.join(root, file), os.path.join(root, file_sorter.normalize(filename)))
-        elif extension.lower() == '.rar':  # Додано підтримку .rar
-            file_sorter.for_print['archives'].append(extension.lower())
-            self.extract_rar(os.path.join(root, file), os.path.join(root, file_sorter.normalize(filename)))
-
-    def extract_zip(self, source, destination):
-        with zipfile.ZipFile(source, 'r') as zip_ref:
-            zip_ref.extractall(destination)
-        os.remove(source)
-
-    def extract_rar(self, source, destination):
-        with RarFile(source, 'r') as rar_ref:
-            rar_ref.extractall(destination)
-        os.remove(source)
+        print(', '.join(extension or 'без розширення' for extension in sorted(file_sorter.unknown_extensions)))
+        if file_sorter.errors:
+            print('Не вдалося обробити:')
+            for path, error in sorted(file_sorter.errors, key=lambda item: item[0]):
+                print(f'{path}: {error}')
 
-    def normalize(self, name):
-        return ''.join(c for c in name if c.isalnum() or c in [' ', '.', '_']).rstrip()
+class ZipExtensionStrategy(DefaultExtensionStrategy):
+    """Sorts like the default strategy and unpacks each archive it moves into a folder next to it.
 
-    def print_results(self, file_sorter):
-        pass
+    The archive itself stays, so the run can be undone. The limits guard
+    against zip bombs: at most max_size bytes and max_entries files, unpacked
+    to at most max_ratio times the archive's size.
+    """
+
+    def __init__(self, extensions=None, sniff=False, max_size=MAX_SIZE, max_entries=MAX_ENTRIES, max_ratio=MAX_RATIO):
+        super().__init__(extensions, sniff)
+        self.extract_limits = {'max_size': max_size, 'max_entries': max_entries, 'max_ratio': max_ratio}
+
+    def extract_to(self, path):
+        if archive_kind(path) is None:
+            return None
+        folder, name = os.path.split(path)
+        return os.path.join(folder, archive_stem(name))
 
 class FileSorter:
-    def __init__(self, path, extension_strategy=None):
+    def __init__(self, path, extension_strategy=None, workers=WORKERS, queue_size=QUEUE_SIZE, duplicates=None):
         self.path = path
         self.extension_strategy = extension_strategy or DefaultExtensionStrategy()
+        self.workers = workers
+        self.queue_size = queue_size
+        # None, or what to do with files identical to one sorted before them: 'report' only,
+        # 'skip' (leave them in place) or 'hardlink' (sort them as links to that file)
+        self.duplicates = duplicates
+        self.duplicate_groups = []
+        self.wasted = 0
+        self.extract_workers = None
+        self.extracted = 0
+        self._extract_limits = {}
+        self._extractions = []
+        self._pool = None
         self.unknown_extensions = set()
         self.for_print = {key: [] for key in self.extension_strategy.extensions.keys()}
+        self.moved = Counter()
+        self.errors = []
+        self.completed = 0
+        self.journal = SortJournal(path)
+        self.lock = threading.Lock()
+        self._made_dirs = set()
+        self._taken = {}
 
-    def sort_files(self):
-        for root, dirs, files in os.walk(self.path):
-            for folder in dirs:
-                if folder.lower() in self.extension_strategy.extensions.keys():
-                    dirs.remove(folder)
+    def scan(self):
+        """Files under path as (root, name), read one directory at a time with os.scandir.
+
+        The category folders the sorter creates and its plan files are skipped,
+        and directory symlinks are not followed.
+        """
+        stack = [self.path]
+        while stack:
+            root = stack.pop()
+            try:
+                with os.scandir(root) as entries:
+                    entries = sorted(entries, key=lambda entry: entry.name)
+            except OSError as e:
+                with self.lock:
+                    self.errors.append((root, e))
+                continue
+            subdirs = []
+            for entry in entries:
+                if entry.is_dir():
+                    if not entry.is_symlink() and entry.name.lower() not in self.extension_strategy.extensions:
+                        subdirs.append(entry.path)
+                elif not self.journal.owns(entry.name):
+                    yield root, entry.name
+            stack.extend(reversed(subdirs))
+
+    def makedirs(self, path):
+        # Each destination folder is created once, not once per file moved into it
+        if path not in self._made_dirs:
+            os.makedirs(path, exist_ok=True)
+            with self.lock:
+                self._made_dirs.add(path)
+
+    def unique_path(self, path):
+        # Never overwrite: a name already in the folder, or planned for it, gets a _1, _2... suffix.
+        # Names are compared ignoring case, as Windows and macOS do.
+        folder, name = os.path.split(path)
+        taken = self._taken.get(folder)
+        if taken is None:
+            taken = self._taken[folder] = {n.lower() for n in os.listdir(folder)} if os.path.isdir(folder) else set()
+        stem, extension = os.path.splitext(name)
+        number = 0
+        while name.lower() in taken:
+            number += 1
+            name = f'{stem}_{number}{extension}'
+        taken.add(name.lower())
+        return os.path.join(folder, name)
+
+    def _planned(self):
+        """(root, file, new path or None) per scanned file, in scan order.
+
+        The workers classify (and sniff) files while the scan goes on; at most
+        queue_size files are in flight, and only the results are merged here.
+        """
+        plan_file = self.extension_strategy.plan_file
+        if self.workers <= 1:
+            for root, file in self.scan():
+                yield root, file, plan_file(self, root, file)
+            return
+        pending = deque()
+        pool = ThreadPoolExecutor(self.workers)
+        try:
+            for root, file in self.scan():
+                pending.append((root, file, pool.submit(plan_file, self, root, file)))
+                if len(pending) >= self.queue_size:
+                    root, file, future = pending.popleft()
+                    yield root, file, future.result()
+            while pending:
+                root, file, future = pending.popleft()
+                yield root, file, future.result()
+        finally:
+            pool.shutdown(cancel_futures=True)
 
-            for file in files:
-                self.extension_strategy.process_file(self, root, file)
+    def _moves(self):
+        for root, file, new_path in self._planned():
+            if new_path is not None:
+                yield os.path.join(root, file), new_path, None
+
+    def _dedupe(self, moves):
+        """The moves with duplicates handled by policy; a file linked to an earlier one follows it."""
+        sizes = []
+        for src, dst, link in moves:
+            try:
+                sizes.append((src, os.lstat(src).st_size))
+            except OSError:
+                pass  # the move reports it
+        groups = find_duplicates(sizes)
+        size_of = dict(sizes)
+        self.wasted = sum(size_of[paths[0]] * (len(paths) - 1) for paths in groups)
+        self.duplicate_groups = [[self.journal.relative(path) for path in paths] for paths in groups]
+        if self.duplicates == 'report':
+            return moves
+        copies = {paths[0]: paths[1:] for paths in groups}
+        dropped = {path for paths in copies.values() for path in paths}
+        dst_of = {src: dst for src, dst, link in moves}
+        result = []
+        for src, dst, link in moves:
+            if src in dropped:
+                if self.duplicates == 'skip':
+                    self.moved[os.path.basename(os.path.dirname(dst))] -= 1
+                continue
+            result.append((src, dst, None))
+            if self.duplicates == 'hardlink':
+                result.extend((copy, dst_of[copy], src) for copy in copies.get(src, ()))
+        return result
+
+    def plan(self):
+        """Scan the folder and write every move to the journal, without touching a file.
+
+        Returns the number of planned moves. Finding duplicates needs every file
+        first, so then the moves are held in memory; otherwise they stream.
+        """
+        created, count = set(), 0
+        moves = self._moves()
+        if self.duplicates:
+            moves = self._dedupe(list(moves))
+
+        def records():
+            nonlocal count
+            final = {}
+            for src, dst, link in moves:
+                folder = os.path.dirname(dst)
+                if folder not in created:
+                    created.add(folder)
+                    if not os.path.isdir(folder):
+                        yield {'op': 'mkdir', 'path': self.journal.relative(folder)}
+                dst = final[src] = self.unique_path(dst)
+                record = {'op': 'move', 'src': self.journal.relative(src), 'dst': self.journal.relative(dst)}
+                if link is not None:
+                    record['link'] = self.journal.relative(final[link])
+                else:
+                    extract_to = self.extension_strategy.extract_to(dst)
+                    if extract_to is not None:
+                        record['extract'] = self.journal.relative(self.unique_path(extract_to))
+                yield record
+                count += 1
+            yield {'op': 'end', 'moves': count, 'moved': dict(self.moved),
+                   'extensions': self.for_print, 'unknown': sorted(self.unknown_extensions),
+                   'duplicates': self.duplicate_groups,
+                   'wasted': self.wasted, 'limits': self.extension_strategy.extract_limits}
+
+        self.journal.write(records())
+        return count
+
+    def _load_summary(self):
+        summary = self.journal.summary()
+        self.moved = Counter(summary['moved'])
+        self.for_print = summary['extensions']
+        self.unknown_extensions = set(summary['unknown'])
+        self.duplicate_groups = summary.get('duplicates', [])
+        self.wasted = summary.get('wasted', 0)
+        self._extract_limits = summary.get('limits') or {}
+        return summary['moves']
+
+    def apply(self):
+        """Carry out the journal's plan; moves an interrupted run already made are skipped."""
+        done = self.journal.state(self._load_summary())
+        try:
+            # Archives moved before an interruption but not unpacked yet
+            for archive, folder in self.journal.extractions(done):
+                self._extract(archive, folder)
+            self._run(self.journal.groups(done), self._apply_move)
+        finally:
+            self.journal.close()
+            self._finish_extractions()
+
+    def undo(self):
+        """Move the files of the journal's run back and drop the folders it created."""
+        done = self.journal.state(self._load_summary())
+        try:
+            self._run(self.journal.groups(done, undo=True), self._undo_move)
+        finally:
+            self.journal.close()
+        if self.errors:
+            return
+        for folder in reversed(self.journal.folders()):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                pass  # not empty: something else was put there since
+        self.journal.remove()
+
+    def _apply_move(self, index, src, dst, link=None, extract_to=None):
+        # Without src but with dst, the move happened before a crash cut off its mark
+        if os.path.lexists(src) or not os.path.lexists(dst):
+            self.makedirs(os.path.dirname(dst))
+            if link is None or not self._link(link, src, dst):
+                self._move(src, dst)
+        if extract_to is not None:
+            self._extract(dst, extract_to)
+        self.journal.mark(index)
+
+    def _extract(self, archive, folder):
+        # Archives unpack in other processes while the moves go on; results are
+        # collected at the end of the run
+        if os.path.isdir(folder):
+            return
+        with self.lock:
+            if self._pool is None:
+                # Not forked: this process is running the mover threads
+                self._pool = ProcessPoolExecutor(self.extract_workers, mp_context=multiprocessing.get_context('spawn'))
+            self._extractions.append((archive, self._pool.submit(extract, archive, folder, **self._extract_limits)))
+
+    def _finish_extractions(self):
+        if self._pool is None:
+            return
+        try:
+            for archive, future in self._extractions:
+                try:
+                    future.result()
+                    self.extracted += 1
+                except (ArchiveError, OSError, BrokenProcessPool) as e:
+                    self.errors.append((archive, e))
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+            self._extractions = []
+
+    def _link(self, target, src, dst):
+        # src has the same contents as target, so dst becomes another name for target
+        try:
+            if not os.path.lexists(dst):
+                os.link(target, dst)
+            elif not os.path.samefile(dst, target):
+                return False  # not the link made before a crash: _move reports it
+        except OSError:
+            return False  # no hard links on this file system: move src as it is
+        os.remove(src)
+        return True
+
+    def _move(self, src, dst):
+        # A file may have appeared at dst since the plan was made; it is reported, never replaced
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, 'файл вже існує', dst)
+        shutil.move(src, dst)
+
+    def _undo_move(self, index, src, dst, link=None, extract_to=None):
+        if extract_to is not None:
+            for folder in (extract_to, partial_folder(extract_to)):
+                if os.path.isdir(folder):
+                    shutil.rmtree(folder)
+        if not os.path.lexists(src):
+            if link is not None and os.stat(dst).st_nlink > 1:
+                # A file of its own again, not one more name for the one it was linked to
+                temp = src + '.sort.tmp'
+                shutil.copy2(dst, temp)
+                os.replace(temp, src)
+                os.remove(dst)
+            else:
+                shutil.move(dst, src)
+        elif os.path.lexists(dst):
+            if link is None:
+                # Something new is at the old place: both files stay and the plan is kept
+                raise FileExistsError(errno.EEXIST, 'файл вже існує', src)
+            os.remove(dst)  # copied back before a crash cut off the rest
+        self.journal.mark(index, done=False)
+
+    def _process(self, handle, moves):
+        # A failed move stops the rest of its group, which would otherwise run out of order
+        for index, src, dst, link, extract_to in moves:
+            try:
+                handle(index, src, dst, link, extract_to)
+            except (OSError, shutil.Error) as e:
+                with self.lock:
+                    self.errors.append((src, e))
+                return
+            with self.lock:
+                self.completed += 1
+
+    def _run(self, items, handle):
+        # One thread reads the plan and feeds a bounded queue, so memory stays flat
+        # on huge trees; the workers create folders and move
+        if self.workers <= 1:
+            for moves in items:
+                self._process(handle, moves)
+            return
+        items_queue = queue.Queue(self.queue_size)
+
+        def work():
+            while True:
+                moves = items_queue.get()
+                if moves is None:
+                    return
+                self._process(handle, moves)
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for moves in items:
+                items_queue.put(moves)
+        finally:
+            for _ in threads:
+                items_queue.put(None)
+            for thread in threads:
+                thread.join()
+
+    def sort_files(self):
+        self.plan()
+        self.apply()
 
     def print_results(self):
         self.extension_strategy.print_results(self)
+        if self.duplicate_groups:
+            copies = sum(len(paths) - 1 for paths in self.duplicate_groups)
+            print(f'Однакові файли: {copies} копій у {len(self.duplicate_groups)} групах, '
+                  f'зайве місце {self.wasted / 1024 / 1024:.1f} МБ')
+            if self.duplicates == 'report':
+                for paths in self.duplicate_groups:
+                    print('  ' + ' = '.join(paths))
+        if self.extracted:
+            print(f'Розпаковано архівів: {self.extracted}')
 
     def normalize(self, name):
         return ''.join(c for c in name if c.isalnum() or c in [' ', '.', '_']).rstrip()
 
 def main():
-    print('Приклад - C:\Users\Admin\Documents\trash')
+    print(r'Приклад - C:\Users\Admin\Documents\trash')
     path = input("Шлях до папки ==>")
-    sorter = FileSorter(path)
-    sorter.sort_files()
+    try:
+        strategy = DefaultExtensionStrategy.from_config(os.environ.get('SORT_CONFIG', 'sort_config.json'))
+    except (OSError, ValueError, AttributeError) as e:
+        print(f'Не вдалося прочитати налаштування категорій ({e}), використовуються стандартні')
+        strategy = DefaultExtensionStrategy()
+    if input("Розпаковувати архіви? (y/n) [n] ==>").strip().lower() in ('y', 'т', 'так'):
+        strategy = ZipExtensionStrategy(strategy.extensions, strategy.sniff)
+    sorter = FileSorter(path, strategy)
+    if sorter.journal.pending():
+        print('Для цієї папки є незавершений план сортування.')
+    print('1 - сортувати, 2 - лише план (без переміщень), 3 - продовжити перерване, 4 - скасувати останнє')
+    choice = input("Дія [1] ==>").strip() or '1'
+    if choice in ('1', '2'):
+        print('Однакові файли: 0 - не шукати, 1 - лише показати, 2 - не переміщувати копії, 3 - замінити копії жорсткими посиланнями')
+        answer = input("Дублікати [0] ==>").strip()
+        sorter.duplicates = dict(zip('123', POLICIES)).get(answer)
+    if choice == '2':
+        count = sorter.plan()
+        sorter.print_results()
+        print(f'Заплановано переміщень: {count}. План збережено у {sorter.journal.plan_path}')
+        print('Вихід у головне меню')
+        return
+    if choice in ('3', '4') and not sorter.journal.exists():
+        print('Немає збереженого плану для цієї папки. Вихід у головне меню')
+        return
+    if choice == '4':
+        sorter.undo()
+        print(f'Повернуто файлів: {sorter.completed}')
+    else:
+        if choice != '3':
+            sorter.plan()
+        sorter.apply()
+        print(f'Переміщено файлів: {sorter.completed}')
     sorter.print_results()
+    print('Сортування завершено. Вихід у головне меню')
 
 if __name__ == "__main__":
     main()